@@ -7,13 +7,26 @@ Binance REST 客户端
 """
 from __future__ import annotations
 
+import threading
 import time
 import typing as t
 import requests
+from requests.adapters import HTTPAdapter
 import hmac
 import hashlib
 from urllib.parse import urlencode
 
+try:
+    # orjson 解析更快；未安装时回退到标准库 json
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+
+def now_ms() -> int:
+    """当前毫秒时间戳（整数运算，避免浮点乘法与截断）。"""
+    return time.time_ns() // 1_000_000
+
 
 class BinanceClient:
     """简单的 Binance 合约 REST 客户端：行情与账户。
@@ -22,10 +35,34 @@ class BinanceClient:
     - api_key/secret_key: 提供后可访问签名接口（如账户余额）
     """
 
+    # exchangeInfo 过滤器缓存时长（秒）
+    EXINFO_TTL_SEC: float = 3600.0
+    # /fapi/v2/account 响应复用时长（秒）
+    ACCOUNT_TTL_SEC: float = 1.0
+
     def __init__(self, base_url: str = "https://fapi.binance.com", api_key: str | None = None, secret_key: str | None = None) -> None:
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.secret_key = secret_key
+        # 复用 HTTP 连接（keep-alive + 连接池），避免每次请求重新进行 TCP/TLS 握手
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        if api_key:
+            self._session.headers.update({"X-MBX-APIKEY": api_key})
+        # 交易对过滤器缓存：symbol -> (获取时刻 monotonic, 过滤器字典)
+        self._exinfo_cache: dict[str, tuple[float, dict]] = {}
+        # 签名请求头：构建一次后复用
+        self._signed_header_dict = {"X-MBX-APIKEY": api_key or ""}
+        self._signed_form_header_dict = {**self._signed_header_dict, "Content-Type": "application/x-www-form-urlencoded"}
+        # 签名用 HMAC-SHA256 模板：密钥只导入一次，签名时 copy() 复用
+        self._hmac_template = hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha256) if secret_key else None
+        # /fapi/v2/account 响应缓存：(获取时刻 monotonic, 响应字典)
+        self._account_cache: tuple[float, dict | None] = (0.0, None)
+        # 缓存代次：每次失效 +1；请求发出前记录代次，返回时若已失效则不回填，避免旧响应覆盖失效
+        self._account_gen = 0
+        self._account_lock = threading.Lock()
 
     def get_klines(
         self,
@@ -47,9 +84,9 @@ class BinanceClient:
         if end_time_ms:
             params["endTime"] = end_time_ms
 
-        resp = requests.get(url, params=params, timeout=10)
+        resp = self._session.get(url, params=params, timeout=10)
         resp.raise_for_status()
-        raw = resp.json()
+        raw = _json.loads(resp.content)
 
         klines: list[dict] = []
         for k in raw:
@@ -77,52 +114,76 @@ class BinanceClient:
         """获取最新价格 (mark price/ticker price)。此处使用 ticker price。"""
         url = f"{self.base_url}/fapi/v1/ticker/price"
         params = {"symbol": symbol.upper()}
-        resp = requests.get(url, params=params, timeout=5)
+        resp = self._session.get(url, params=params, timeout=5)
         resp.raise_for_status()
-        data = resp.json()
+        data = _json.loads(resp.content)
         return float(data["price"]) 
 
     # ----------------- Auth helpers & signed endpoints -----------------
-    def _signed_headers(self) -> dict:
+    def _signed_headers(self, form: bool = False) -> dict:
+        """返回签名请求头（预先构建的共享字典，不在每次请求时新建）。form=True 时附带表单 Content-Type。"""
         if not self.api_key:
             raise RuntimeError("API key not set for signed request")
-        return {"X-MBX-APIKEY": self.api_key}
+        return self._signed_form_header_dict if form else self._signed_header_dict
 
-    def _sign_params(self, params: dict) -> dict:
+    def _signed_query(self, params: dict) -> str:
+        """编码参数并追加签名，返回完整查询串；GET 直接拼接到 URL，POST 作为表单正文，避免 requests 再次编码。"""
         if not self.secret_key:
             raise RuntimeError("Secret key not set for signed request")
         query = urlencode(params)
-        sig = hmac.new(self.secret_key.encode("utf-8"), query.encode("utf-8"), hashlib.sha256).hexdigest()
-        params["signature"] = sig
-        return params
+        # 复制预先导入密钥的 HMAC 模板，避免每次签名重新计算 ipad/opad
+        h = self._hmac_template.copy()
+        h.update(query.encode("utf-8"))
+        return f"{query}&signature={h.hexdigest()}"
+
+    def _fetch_account(self, recv_window_ms: int = 5000, fresh: bool = False) -> dict:
+        """获取 GET /fapi/v2/account（签名）的解析结果，ACCOUNT_TTL_SEC 内复用同一份响应。
+
+        余额、账户总览与持仓均来自该接口，同一轮轮询只需一次签名请求。失败时抛出异常。
+        fresh=True 时跳过缓存直接请求（下单后的确认轮询使用），结果仍回填缓存。
+        """
+        ts, cached = self._account_cache
+        if not fresh and cached is not None and time.monotonic() - ts < self.ACCOUNT_TTL_SEC:
+            return cached
+        gen = self._account_gen
+        url = f"{self.base_url}/fapi/v2/account"
+        params = {
+            "timestamp": now_ms(),
+            "recvWindow": recv_window_ms,
+        }
+        query = self._signed_query(params)
+        resp = self._session.get(f"{url}?{query}", headers=self._signed_headers(), timeout=8)
+        resp.raise_for_status()
+        data = _json.loads(resp.content)
+        with self._account_lock:
+            # 请求期间若缓存已被失效（如期间下单），该响应可能早于下单，不回填
+            if gen == self._account_gen:
+                self._account_cache = (time.monotonic(), data)
+        return data
+
+    def _invalidate_account(self) -> None:
+        """下单/改杠杆/改持仓模式后丢弃账户缓存，保证随后的查询拿到最新状态。"""
+        with self._account_lock:
+            self._account_gen += 1
+            self._account_cache = (0.0, None)
 
     def get_futures_balance(self, asset: str = "USDT", recv_window_ms: int = 5000) -> float | None:
         """查询合约账户余额（USDⓈ-M）。
 
         返回指定资产的 wallet balance；若接口或资产不存在，返回 None。
-        参考：GET /fapi/v2/balance （签名）
+        参考：GET /fapi/v2/account （签名）的 assets[].walletBalance
         """
         if not (self.api_key and self.secret_key):
             return None
-        url = f"{self.base_url}/fapi/v2/balance"
-        params = {
-            "timestamp": int(time.time() * 1000),
-            "recvWindow": recv_window_ms,
-        }
-        params = self._sign_params(params)
         try:
-            resp = requests.get(url, params=params, headers=self._signed_headers(), timeout=8)
-            resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, list):
-                for item in data:
-                    try:
-                        if str(item.get("asset")).upper() == asset.upper():
-                            # futures balance 字段为 balance，可选 availableBalance
-                            bal = item.get("balance")
-                            return float(bal) if bal is not None else None
-                    except Exception:
-                        continue
+            data = self._fetch_account(recv_window_ms)
+            for item in data.get("assets") or []:
+                try:
+                    if str(item.get("asset")).upper() == asset.upper():
+                        bal = item.get("walletBalance")
+                        return float(bal) if bal is not None else None
+                except Exception:
+                    continue
             return None
         except Exception:
             # 保持稳健：失败时返回 None，调用方自行回退到配置值
@@ -136,16 +197,8 @@ class BinanceClient:
         """
         if not (self.api_key and self.secret_key):
             return None
-        url = f"{self.base_url}/fapi/v2/account"
-        params = {
-            "timestamp": int(time.time() * 1000),
-            "recvWindow": recv_window_ms,
-        }
-        params = self._sign_params(params)
         try:
-            resp = requests.get(url, params=params, headers=self._signed_headers(), timeout=8)
-            resp.raise_for_status()
-            data = resp.json()
+            data = self._fetch_account(recv_window_ms)
             twb = data.get("totalWalletBalance")
             tmb = data.get("totalMarginBalance")
             out = {}
@@ -161,27 +214,14 @@ class BinanceClient:
     def get_symbol_step_size(self, symbol: str) -> float | None:
         """查询交易对的数量步进（LOT_SIZE.stepSize），用于数量取整。
 
-        参考：GET /fapi/v1/exchangeInfo
+        复用 `get_symbol_filters` 的缓存结果，不再单独请求 exchangeInfo。
         """
-        try:
-            url = f"{self.base_url}/fapi/v1/exchangeInfo"
-            params = {"symbol": symbol.upper()}
-            resp = requests.get(url, params=params, timeout=8)
-            resp.raise_for_status()
-            data = resp.json()
-            symbols = data.get("symbols") or []
-            for s in symbols:
-                if str(s.get("symbol")).upper() == symbol.upper():
-                    filters = s.get("filters") or []
-                    for f in filters:
-                        if f.get("filterType") == "LOT_SIZE":
-                            step = f.get("stepSize")
-                            return float(step) if step is not None else None
-            return None
-        except Exception:
+        filters = self.get_symbol_filters(symbol)
+        if not filters:
             return None
+        return filters.get("stepSize")
 
-    def get_futures_position(self, symbol: str, recv_window_ms: int = 5000, prefer_side: str | None = None) -> dict | None:
+    def get_futures_position(self, symbol: str, recv_window_ms: int = 5000, prefer_side: str | None = None, fresh: bool = False) -> dict | None:
         """查询指定交易对的合约持仓信息（USDⓈ-M）。
 
         来源：GET /fapi/v2/account（签名）。该接口返回 positions 列表。
@@ -195,19 +235,13 @@ class BinanceClient:
         - positionSide: BOTH/LONG/SHORT
         - unrealizedProfit: 未实现盈亏（来自 Binance 原始字段）
         - margin: 统一保证金数值（优先 initialMargin；否则使用 isolatedWallet）
+
+        fresh=True 时绕过账户缓存（下单后的持仓确认须看到最新仓位）。
         """
         if not (self.api_key and self.secret_key):
             return None
         try:
-            url = f"{self.base_url}/fapi/v2/account"
-            params = {
-                "timestamp": int(time.time() * 1000),
-                "recvWindow": recv_window_ms,
-            }
-            params = self._sign_params(params)
-            resp = requests.get(url, params=params, headers=self._signed_headers(), timeout=8)
-            resp.raise_for_status()
-            data = resp.json()
+            data = self._fetch_account(recv_window_ms, fresh=fresh)
             positions = [p for p in (data.get("positions") or []) if str(p.get("symbol")).upper() == symbol.upper()]
             if not positions:
                 return None
@@ -264,12 +298,13 @@ class BinanceClient:
             params = {
                 "symbol": symbol.upper(),
                 "leverage": int(leverage),
-                "timestamp": int(time.time() * 1000),
+                "timestamp": now_ms(),
                 "recvWindow": recv_window_ms,
             }
-            params = self._sign_params(params)
+            query = self._signed_query(params)
             # 使用表单提交以符合 Binance 要求
-            resp = requests.post(url, data=params, headers=self._signed_headers(), timeout=8)
+            resp = self._session.post(url, data=query, headers=self._signed_headers(form=True), timeout=8)
+            self._invalidate_account()
             resp.raise_for_status()
             return True
         except Exception:
@@ -300,7 +335,7 @@ class BinanceClient:
                 "type": "MARKET",
                 "quantity": quantity,
                 "newOrderRespType": new_order_resp_type,
-                "timestamp": int(time.time() * 1000),
+                "timestamp": now_ms(),
                 "recvWindow": recv_window_ms,
             }
             # 仅当需要减仓时才发送 reduceOnly，避免 -1106 错误
@@ -309,33 +344,41 @@ class BinanceClient:
             # 双向持仓（Hedge Mode）需要显式传递 positionSide
             if position_side:
                 params["positionSide"] = position_side.upper()
-            params = self._sign_params(params)
-            resp = requests.post(url, data=params, headers=self._signed_headers(), timeout=10)
+            query = self._signed_query(params)
+            resp = self._session.post(url, data=query, headers=self._signed_headers(form=True), timeout=10)
+            # 订单可能已改变持仓，丢弃账户缓存以便确认轮询读取最新持仓
+            self._invalidate_account()
             if resp.status_code >= 400:
                 try:
-                    return {"error": True, "status_code": resp.status_code, "details": resp.json()}
+                    return {"error": True, "status_code": resp.status_code, "details": _json.loads(resp.content)}
                 except Exception:
                     return {"error": True, "status_code": resp.status_code, "details": {"message": resp.text}}
             resp.raise_for_status()
-            return resp.json()
+            return _json.loads(resp.content)
         except Exception as e:
             return {"error": True, "exception": str(e)}
 
     def get_symbol_filters(self, symbol: str) -> dict | None:
-        """查询交易对过滤器：LOT_SIZE、MARKET_LOT_SIZE、MIN_NOTIONAL。
+        """查询交易对过滤器：LOT_SIZE、MARKET_LOT_SIZE、MIN_NOTIONAL、PRICE_FILTER。
 
-        返回：{"stepSize": float, "minQty": float, "marketMinQty": float, "minNotional": float}
+        返回：{"stepSize": float, "minQty": float, "marketMinQty": float, "minNotional": float, "tickSize": float}
         参考：GET /fapi/v1/exchangeInfo
+
+        exchangeInfo 响应体较大且极少变化，结果按交易对缓存 EXINFO_TTL_SEC 秒；查询失败不缓存。
         """
+        sym = symbol.upper()
+        ts, cached = self._exinfo_cache.get(sym, (0.0, None))
+        if cached is not None and time.monotonic() - ts < self.EXINFO_TTL_SEC:
+            return cached
         try:
             url = f"{self.base_url}/fapi/v1/exchangeInfo"
-            params = {"symbol": symbol.upper()}
-            resp = requests.get(url, params=params, timeout=8)
+            params = {"symbol": sym}
+            resp = self._session.get(url, params=params, timeout=8)
             resp.raise_for_status()
-            data = resp.json()
+            data = _json.loads(resp.content)
             symbols = data.get("symbols") or []
             for s in symbols:
-                if str(s.get("symbol")).upper() == symbol.upper():
+                if str(s.get("symbol")).upper() == sym:
                     out: dict = {}
                     filters = s.get("filters") or []
                     for f in filters:
@@ -355,6 +398,12 @@ class BinanceClient:
                             v = f.get("minNotional")
                             if v is not None:
                                 out["minNotional"] = float(v)
+                        elif ftype == "PRICE_FILTER":
+                            v = f.get("tickSize")
+                            if v is not None:
+                                out["tickSize"] = float(v)
+                    if out:
+                        self._exinfo_cache[sym] = (time.monotonic(), out)
                     return out or None
             return None
         except Exception:
@@ -370,13 +419,13 @@ class BinanceClient:
         try:
             url = f"{self.base_url}/fapi/v1/positionSide/dual"
             params = {
-                "timestamp": int(time.time() * 1000),
+                "timestamp": now_ms(),
                 "recvWindow": recv_window_ms,
             }
-            params = self._sign_params(params)
-            resp = requests.get(url, params=params, headers=self._signed_headers(), timeout=8)
+            query = self._signed_query(params)
+            resp = self._session.get(f"{url}?{query}", headers=self._signed_headers(), timeout=8)
             resp.raise_for_status()
-            data = resp.json()
+            data = _json.loads(resp.content)
             # {"dualSidePosition": true/false}
             val = data.get("dualSidePosition")
             return bool(val) if val is not None else None
@@ -396,11 +445,12 @@ class BinanceClient:
             url = f"{self.base_url}/fapi/v1/positionSide/dual"
             params = {
                 "dualSidePosition": "true" if enable else "false",
-                "timestamp": int(time.time() * 1000),
+                "timestamp": now_ms(),
                 "recvWindow": recv_window_ms,
             }
-            params = self._sign_params(params)
-            resp = requests.post(url, data=params, headers=self._signed_headers(), timeout=8)
+            query = self._signed_query(params)
+            resp = self._session.post(url, data=query, headers=self._signed_headers(form=True), timeout=8)
+            self._invalidate_account()
             resp.raise_for_status()
             return True
         except Exception:
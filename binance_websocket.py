@@ -5,18 +5,34 @@ Binance WebSocket 客户端
 """
 from __future__ import annotations
 
-import json
+import logging
+import sys
 import threading
 import time
 import typing as t
 
 import websocket
 
+from log_utils import queued_logger
+
+try:
+    # orjson 解析更快（可直接接受 str/bytes）；未安装时回退到标准库 json
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+
+# WS 日志：回调线程只把记录放入队列，由后台监听线程负责输出，避免阻塞 run_forever
+_ws_handler = logging.StreamHandler(sys.stdout)
+_ws_handler.setFormatter(logging.Formatter("[WS] %(message)s"))
+logger = queued_logger("binance_ws", _ws_handler)
+
 
 class BinanceWebSocket:
     """简单的 WebSocket 封装：订阅 `{symbol}@kline_{interval}` 流。
 
-    - on_kline: 回调函数，接收字典参数，包含 kline 关键字段
+    - on_kline: 回调函数，接收字典参数，包含 kline 关键字段；
+      该字典在每条消息间复用，回调需即时消费，如需保留请自行拷贝
     - on_open_cb/on_error_cb/on_close_cb: 连接状态回调，便于上层做降级或恢复
     - auto_reconnect: 断线自动重连（指数退避）
     """
@@ -43,6 +59,9 @@ class BinanceWebSocket:
         self._thread: threading.Thread | None = None
         self._stop = threading.Event()
         self._reconnect_delay = 2  # 秒，指数退避
+        self._parse_errors = 0  # 解析失败计数，用于限流错误日志
+        # 复用的回调载荷，避免每条消息重新分配字典
+        self._payload: dict = {}
 
     @property
     def url(self) -> str:
@@ -51,34 +70,41 @@ class BinanceWebSocket:
         stream = f"{self.symbol.lower()}@kline_{self.interval}"
         return f"wss://fstream.binance.com/stream?streams={stream}"
 
-    def _on_message(self, _ws, message: str):
+    def _on_data(self, _ws, message: bytes, _opcode: int, _fin: bool):
+        # 配合 skip_utf8_validation，直接收到原始 bytes，json/orjson 均可直接解析，省去一次 UTF-8 解码
         try:
-            data = json.loads(message)
-            # combined stream: { stream, data: { e, E, k: {...} } }
-            kline_container = data.get("data") if "data" in data else data
-            k = (kline_container or {}).get("k", {})
-            if not k:
-                return
-            payload = {
-                "event_time": (kline_container or {}).get("E"),
-                "open_time": k.get("t"),
-                "close_time": k.get("T"),
-                "interval": k.get("i"),
-                "is_final": bool(k.get("x")),
-                "open": float(k.get("o")),
-                "high": float(k.get("h")),
-                "low": float(k.get("l")),
-                "close": float(k.get("c")),
-                "volume": float(k.get("v")),
-            }
+            data = _json.loads(message)
+            # combined stream: { stream, data: { e, E, k: {...} } }；单流格式仅作回退
+            try:
+                kline_container = data["data"]
+                k = kline_container["k"]
+            except KeyError:
+                kline_container = data
+                k = data.get("k")
+                if not k:
+                    return
+            # Binance 以字符串编码数值字段，一次性转换为 float
+            o, h, l, c, v = map(float, (k["o"], k["h"], k["l"], k["c"], k["v"]))
+            payload = self._payload
+            payload["event_time"] = kline_container.get("E")
+            payload["open_time"] = k.get("t")
+            payload["close_time"] = k.get("T")
+            payload["interval"] = k.get("i")
+            payload["is_final"] = bool(k.get("x"))
+            payload["open"] = o
+            payload["high"] = h
+            payload["low"] = l
+            payload["close"] = c
+            payload["volume"] = v
             self.on_kline(payload)
         except Exception:
-            # 保持健壮性，避免回调异常导致断开
-            print("[WS] parse message error")
+            # 保持健壮性，避免回调异常导致断开；错误风暴时每 100 次仅记录一次堆栈
+            self._parse_errors += 1
+            if self._parse_errors % 100 == 1:
+                logger.exception("parse message error (count=%d)", self._parse_errors)
 
     def _on_error(self, _ws, error):
-        # 简单打印错误，可进一步接入日志系统
-        print("[WS] error:", error)
+        logger.error("error: %s", error)
         try:
             if self.on_error_cb:
                 self.on_error_cb(error)
@@ -86,7 +112,7 @@ class BinanceWebSocket:
             pass
 
     def _on_close(self, _ws, _a, _b):
-        print("[WS] closed")
+        logger.info("closed")
         try:
             if self.on_close_cb:
                 self.on_close_cb()
@@ -99,7 +125,7 @@ class BinanceWebSocket:
             self._start()
 
     def _on_open(self, _ws):
-        print("[WS] opened", self.url)
+        logger.info("opened %s", self.url)
         # 连接成功后重置退避
         self._reconnect_delay = 2
         try:
@@ -111,13 +137,13 @@ class BinanceWebSocket:
     def _start(self):
         self._ws = websocket.WebSocketApp(
             self.url,
-            on_message=self._on_message,
+            on_data=self._on_data,
             on_error=self._on_error,
             on_close=self._on_close,
             on_open=self._on_open,
         )
         # 调整心跳参数，降低超时概率
-        self._ws.run_forever(ping_interval=10, ping_timeout=8)
+        self._ws.run_forever(ping_interval=10, ping_timeout=8, skip_utf8_validation=True)
 
     def start(self):
         if self._thread and self._thread.is_alive():
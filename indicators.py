@@ -5,21 +5,41 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from itertools import accumulate
 import typing as t
 
 
+def _sma_tail(values: t.Sequence[float], period: int) -> t.Iterator[float]:
+    """第 period 根起的 SMA 值（调用方保证 len(values) >= period）。
+
+    使用前缀和（itertools.accumulate，C 层循环）一次性求出所有窗口和，
+    整体复杂度 O(N)，与周期长度无关。
+    """
+    csum = [0.0]
+    csum.extend(accumulate(values))
+    return ((hi - lo) / period for hi, lo in zip(csum[period:], csum))
+
+
+def _ema_tail(values: t.Sequence[float], period: int) -> t.Iterator[float]:
+    """第 period 根起的 EMA 值（调用方保证 len(values) >= period）。"""
+    k = 2 / (period + 1)
+    # 以首个完整窗口的 SMA 作为初始 EMA
+    ema_prev = sum(values[:period]) / period
+    yield ema_prev
+    for v in values[period:]:
+        ema_prev += k * (v - ema_prev)
+        yield ema_prev
+
+
 def sma(values: list[float], period: int) -> list[float]:
     """简单移动平均 (SMA)。返回与输入等长的列表，前期不足的用 None 填充。"""
-    out: list[float] = []
-    window: list[float] = []
-    for v in values:
-        window.append(v)
-        if len(window) > period:
-            window.pop(0)
-        if len(window) < period:
-            out.append(None)
-        else:
-            out.append(sum(window) / period)
+    if period <= 0:
+        raise ValueError("period must be > 0")
+    n = len(values)
+    if n < period:
+        return [None] * n
+    out: list[float] = [None] * (period - 1)
+    out.extend(_sma_tail(values, period))
     return out
 
 
@@ -29,27 +49,16 @@ def ema(values: list[float], period: int) -> list[float]:
     与主流交易所（含 Binance）一致：
     - 使用前 `period` 根的 SMA 作为 EMA 初始值；
     - 后续 EMA_t = price_t * k + EMA_{t-1} * (1-k)，其中 k = 2/(period+1)。
+
+    递推按等价形式 EMA_t = EMA_{t-1} + k * (price_t - EMA_{t-1}) 计算，每步仅一次乘法。
     """
     if period <= 0:
         raise ValueError("period must be > 0")
-    out: list[float] = []
-    k = 2 / (period + 1)
-    ema_prev: float | None = None
-    for i, v in enumerate(values):
-        if i < period - 1:
-            # 前期不足，填 None
-            out.append(None)
-            continue
-        if i == period - 1:
-            # 以首个完整窗口的 SMA 作为初始 EMA
-            window = values[:period]
-            ema_prev = sum(window) / period
-            out.append(ema_prev)
-            continue
-        # 正常迭代
-        ema_curr = v * k + (ema_prev if ema_prev is not None else v) * (1 - k)
-        ema_prev = ema_curr
-        out.append(ema_curr)
+    n = len(values)
+    if n < period:
+        return [None] * n
+    out: list[float] = [None] * (period - 1)
+    out.extend(_ema_tail(values, period))
     return out
 
 
@@ -74,19 +83,32 @@ def crossover(ema_list: list[float], ma_list: list[float], eps: float = 1e-8) ->
     if len(ema_list) < 2 or len(ma_list) < 2:
         return CrossSignal(False, False)
 
-    prev_ema, curr_ema = ema_list[-2], ema_list[-1]
-    prev_ma, curr_ma = ma_list[-2], ma_list[-1]
-    if prev_ema is None or curr_ema is None or prev_ma is None or curr_ma is None:
+    # 以 EMA-MA 差值判断，两个方向共用同一组差值；任一点为 None 时减法抛 TypeError 即视为无效
+    try:
+        d_prev = ema_list[-2] - ma_list[-2]
+        d_curr = ema_list[-1] - ma_list[-1]
+    except TypeError:
         return CrossSignal(False, False)
 
-    golden = (prev_ema <= (prev_ma + eps)) and (curr_ema >= (curr_ma - eps))
-    death = (prev_ema >= (prev_ma - eps)) and (curr_ema <= (curr_ma + eps))
+    golden, death = cross_flags(d_prev, d_curr, eps)
     return CrossSignal(golden_cross=golden, death_cross=death)
 
 
-def is_rising(series: list[float], lookback: int = 3) -> bool:
-    """判断指标是否呈上升趋势：最近 lookback 根单调非降。"""
+def cross_flags(d_prev: float, d_curr: float, eps: float = 1e-8) -> tuple[bool, bool]:
+    """由前一根/当前根的 EMA-MA 差值返回 (金叉, 死叉)，规则同 `crossover`。
+
+    供逐 tick 路径在已取得末两点时直接调用，无需再传入整条序列。
+    """
+    return (d_prev <= eps) & (d_curr >= -eps), (d_prev >= -eps) & (d_curr <= eps)
+
+
+def is_rising(series: t.Sequence[float], lookback: int = 3) -> bool:
+    """判断指标是否呈上升趋势：最近 lookback 根单调非降；含 None（预热期）视为否。"""
     if not series or len(series) < lookback:
         return False
-    s = series[-lookback:]
-    return all(s[i] <= s[i + 1] for i in range(len(s) - 1))
\ No newline at end of file
+    # 按负下标取尾部，list/deque 通用（deque 不支持切片，但两端下标访问为 O(1)）
+    s = [series[i] for i in range(-lookback, 0)]
+    if None in s:
+        return False
+    # 相邻成对比较，避免逐次下标访问
+    return all(a <= b for a, b in zip(s, s[1:]))
\ No newline at end of file
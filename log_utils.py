@@ -0,0 +1,29 @@
+"""
+日志工具：经队列异步输出的 logger，供 WS 客户端与交易引擎共用。
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def queued_logger(name: str, handler: logging.Handler, level: int = logging.INFO) -> logging.Logger:
+    """返回名为 name 的 logger：调用线程只把记录放入队列，由后台监听线程交给 handler 输出，
+    行情回调与下单路径不等待 stdout/磁盘 I/O。
+
+    同名 logger 已配置过时直接返回，传入的 handler 不再使用并被关闭。
+    """
+    lg = logging.getLogger(name)
+    if lg.handlers:
+        handler.close()
+        return lg
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(q, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    lg.addHandler(QueueHandler(q))
+    lg.setLevel(level)
+    lg.propagate = False
+    return lg
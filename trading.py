@@ -10,25 +10,151 @@
 """
 from __future__ import annotations
 
+import atexit
 import os
+import queue
 import sqlite3
+import sys
+import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from itertools import islice
 from typing import Optional, Callable
 import math
 import logging
 from logging.handlers import RotatingFileHandler
 
-from indicators import ema, sma, crossover, is_rising
-from binance_client import BinanceClient
+from indicators import ema, sma, cross_flags
+from binance_client import BinanceClient, now_ms
+from log_utils import queued_logger
+
+
+# 建表与迁移脚本（_init_db 中一次 executescript 执行）
+_SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS klines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT,
+    interval TEXT,
+    open_time INTEGER,
+    close_time INTEGER,
+    open REAL, high REAL, low REAL, close REAL,
+    volume REAL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time INTEGER,
+    symbol TEXT,
+    side TEXT,
+    price REAL,
+    qty REAL,
+    fee REAL,
+    pnl REAL,
+    balance_after REAL
+);
+CREATE TABLE IF NOT EXISTS wallet (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time INTEGER,
+    balance REAL
+);
+-- 记录当前未平仓的持仓，便于程序重启后恢复
+CREATE TABLE IF NOT EXISTS position (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time INTEGER,
+    side TEXT,
+    entry_price REAL,
+    qty REAL,
+    open_fee REAL
+);
+-- 系统元信息：记录数据库初始化时间，供“交易时长”展示使用
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_time INTEGER
+);
+-- 旧库的持仓行 id 为自增值：仅保留最新一行并归一为 id=1，之后统一按单行覆盖写入
+DELETE FROM position WHERE id < (SELECT MAX(id) FROM position);
+UPDATE position SET id = 1 WHERE id <> 1;
+-- 按 side 过滤的统计/持仓恢复查询（side='CLOSE' / IN ('LONG','SHORT')）走索引
+CREATE INDEX IF NOT EXISTS idx_trades_side ON trades(side);
+"""
+_SQL_INSERT_KLINE = (
+    "INSERT OR IGNORE INTO klines(symbol, interval, open_time, close_time, open, high, low, close, volume) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_SQL_INSERT_TRADE = (
+    "INSERT INTO trades(time, symbol, side, price, qty, fee, pnl, balance_after) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_SQL_INSERT_WALLET = "INSERT INTO wallet(time, balance) VALUES (?, ?)"
+# position 表固定只有 id=1 一行：有持仓时整行覆盖写入，平仓时删除
+_SQL_UPSERT_POSITION = (
+    "INSERT OR REPLACE INTO position(id, time, side, entry_price, qty, open_fee) "
+    "VALUES (1, ?, ?, ?, ?, ?)"
+)
+_SQL_CLEAR_POSITION = "DELETE FROM position"
+# 累计统计播种（见 _seed_totals）
+_SQL_SEED_TOTALS = (
+    "SELECT COALESCE(SUM(CASE WHEN side = 'CLOSE' THEN pnl END), 0.0), "
+    "SUM(side = 'CLOSE'), "
+    "COALESCE(SUM(fee), 0.0), "
+    "(SELECT balance FROM wallet ORDER BY id ASC LIMIT 1) "
+    "FROM trades"
+)
+# 最近记录查询：显式列出列名，结果按列名元组 zip 成字典
+_TRADE_COLS = ("id", "time", "symbol", "side", "price", "qty", "fee", "pnl", "balance_after")
+_KLINE_COLS = ("id", "symbol", "interval", "open_time", "close_time", "open", "high", "low", "close", "volume")
+_SQL_RECENT_TRADES = f"SELECT {', '.join(_TRADE_COLS)} FROM trades ORDER BY id DESC LIMIT ?"
+_SQL_RECENT_KLINES = f"SELECT {', '.join(_KLINE_COLS)} FROM klines ORDER BY id DESC LIMIT ?"
+
+
+# 控制台日志（输出到 stdout，与 print 一致）：记录先入队，由后台线程写出，不阻塞行情回调
+_console_handler = logging.StreamHandler(sys.stdout)
+_console_handler.setFormatter(logging.Formatter("%(message)s"))
+logger = queued_logger("trading", _console_handler)
+# 高频调试日志：级别由 enable_tick_log / enable_signal_debug_log 控制，未开启时 %-参数不会被格式化
+_tick_logger = logging.getLogger("trading.tick")
+_signal_logger = logging.getLogger("trading.signal")
+
+
+def _cfg(d: dict, key: str, default, caster: Callable):
+    """读取配置项并转换类型；缺失或显式为 null 时返回默认值。"""
+    v = d.get(key)
+    return caster(v) if v is not None else default
 
 
-@dataclass
 class Position:
-    side: Optional[str]  # "LONG" | "SHORT" | None
-    entry_price: float | None
-    qty: float | None
-    open_fee: float | None
+    """持仓快照。按不可变对象使用：状态变化时整体替换 engine.position，
+    其他线程（状态接口）读取到的始终是一致的一组字段。
+
+    使用显式 __slots__（dataclass 的 slots=True 需要 Python 3.10+），部署环境为 3.9 时同样生效。"""
+
+    __slots__ = ("side", "entry_price", "qty", "open_fee", "sign")
+
+    def __init__(
+        self,
+        side: Optional[str],  # "LONG" | "SHORT" | None
+        entry_price: float | None,
+        qty: float | None,
+        open_fee: float | None,
+    ) -> None:
+        self.side = side
+        self.entry_price = entry_price
+        self.qty = qty
+        self.open_fee = open_fee
+        # 方向符号（LONG=+1，SHORT=-1，空仓=0），由 side 派生，平仓盈亏 = (平仓价 - 开仓价) × 数量 × sign
+        self.sign = _SIDE_SIGN.get(side, 0)
+
+    def __repr__(self) -> str:
+        return f"Position(side={self.side!r}, entry_price={self.entry_price!r}, qty={self.qty!r}, open_fee={self.open_fee!r})"
+
+
+_SIDE_SIGN = {"LONG": 1, "SHORT": -1}
+# 下单方向按持仓符号查表（开仓：多买空卖；平仓相反），字符串只在 API 边界出现
+_OPEN_ORDER_SIDE = {1: "BUY", -1: "SELL"}
+_CLOSE_ORDER_SIDE = {1: "SELL", -1: "BUY"}
+
+
+# 空仓状态共享同一实例（从不原地修改），平仓时无需再分配对象
+_FLAT = Position(side=None, entry_price=None, qty=None, open_fee=None)
 
 
 class TradingEngine:
@@ -39,62 +165,63 @@ class TradingEngine:
         self.symbol = tcfg.get("symbol", "BTCUSDT").upper()
         self.interval = tcfg.get("interval", "1m")
         # 初始保证金：默认使用配置；若为实盘模式且提供密钥，则从合约账户余额获取
-        self.initial_balance = float(tcfg.get("initial_balance", 1000.0))
+        self.initial_balance = _cfg(tcfg, "initial_balance", 1000.0, float)
         self.balance = self.initial_balance
-        self.percent = float(tcfg.get("percent", 0.5))
-        self.leverage = int(tcfg.get("leverage", 10))
-        self.fee_rate = float(tcfg.get("fee_rate", 0.0005))
-        self.test_mode = bool(tcfg.get("test_mode", True))
+        self.percent = _cfg(tcfg, "percent", 0.5, float)
+        self.leverage = _cfg(tcfg, "leverage", 10, int)
+        self.fee_rate = _cfg(tcfg, "fee_rate", 0.0005, float)
+        self.test_mode = _cfg(tcfg, "test_mode", True, bool)
         # 日志控制：关闭高频 [TICK] 与信号调试日志，避免刷屏
-        self.enable_tick_log: bool = bool(tcfg.get("enable_tick_log", False))
-        self.enable_signal_debug_log: bool = bool(tcfg.get("enable_signal_debug_log", False))
+        self.enable_tick_log: bool = _cfg(tcfg, "enable_tick_log", False, bool)
+        self.enable_signal_debug_log: bool = _cfg(tcfg, "enable_signal_debug_log", False, bool)
+        _tick_logger.setLevel(logging.DEBUG if self.enable_tick_log else logging.INFO)
+        _signal_logger.setLevel(logging.DEBUG if self.enable_signal_debug_log else logging.INFO)
 
-        self.ema_period = int(icfg.get("ema_period", 5))
-        self.ma_period = int(icfg.get("ma_period", 15))
+        self.ema_period = _cfg(icfg, "ema_period", 5, int)
+        self.ma_period = _cfg(icfg, "ma_period", 15, int)
         
 
         # 状态
-        self.position = Position(side=None, entry_price=None, qty=None, open_fee=None)
+        self.position = _FLAT
         self.current_price: float | None = None
         # 内存优化：限制内存中序列的最大长度（默认 2000）
-        self.series_maxlen: int = int(tcfg.get("series_maxlen", 2000))
-        self.timestamps = []  # close_time
-        self.closes = []
-        self.ema_list = []
-        self.ma_list = []
+        self.series_maxlen: int = _cfg(tcfg, "series_maxlen", 2000, int)
+        # 定长环形缓冲：超出 series_maxlen 时自动挤出最旧数据，无需每个 tick 切片复制（<=0 表示不限长度）
+        self._series_cap: int | None = self.series_maxlen if self.series_maxlen > 0 else None
+        self.timestamps: deque[int] = deque(maxlen=self._series_cap)  # close_time
+        self.closes: deque[float] = deque(maxlen=self._series_cap)
+        self.ema_list: deque[float | None] = deque(maxlen=self._series_cap)
+        self.ma_list: deque[float | None] = deque(maxlen=self._series_cap)
+        # 序列推进与快照互斥：deque 在迭代期间被修改会抛 RuntimeError，其他线程须经 series_snapshot 读取
+        self._series_lock = threading.Lock()
+        # 增量指标状态：EMA 系数与最近 ma_period 根收盘价之和（由 _recalc_indicators 播种）
+        self._ema_k = 2 / (self.ema_period + 1)
+        self._ma_sum = 0.0
         self.latest_kline: dict | None = None  # 未收盘的实时K线（完整O/H/L/C/Vol）
+        # 上一个 tick 的收盘时间与价格，用于跳过同一根 K 线内的重复推送
+        self._last_tick_close_time: int | None = None
+        self._last_tick_price: float | None = None
         # 交叉日志去抖：仅当金叉/死叉状态发生变化时写日志
         self._last_cross_tag: str | None = None  # 'GOLDEN' | 'DEATH' | None
         # 确认等待配置（类似 WebDriverWait）：在一个较短的超时时间内轮询条件达成
-        self.confirm_timeout_sec: float = float(tcfg.get("confirm_timeout_sec", 2.0))
-        self.confirm_poll_interval_sec: float = float(tcfg.get("confirm_poll_interval_sec", 0.25))
+        self.confirm_timeout_sec: float = _cfg(tcfg, "confirm_timeout_sec", 2.0, float)
+        self.confirm_poll_interval_sec: float = _cfg(tcfg, "confirm_poll_interval_sec", 0.25, float)
+        # 空仓时手动持仓同步的最小间隔（秒）：tick 回调中最多每隔该时长发起一次持仓查询
+        self.pos_sync_interval_sec: float = _cfg(tcfg, "pos_sync_interval_sec", 5.0, float)
+        self._pos_sync_last = 0.0
         # 计算选项
-        icfg = config.get("indicators", {})
         # 是否仅使用已收盘K线参与均线计算（更贴近多数交易所图表）
-        self.use_closed_only: bool = bool(icfg.get("use_closed_only", True))
+        self.use_closed_only: bool = _cfg(icfg, "use_closed_only", True, bool)
         # 是否将 EMA/MA 斜率（趋势）纳入开仓条件
-        self.use_slope: bool = bool(icfg.get("use_slope", True))
+        self.use_slope: bool = _cfg(icfg, "use_slope", True, bool)
 
         # 日志文件（项目目录下 trading.log）
         try:
             base_dir = os.path.dirname(os.path.abspath(__file__))
-            log_path = os.path.join(base_dir, "trading.log")
-            self._logger = logging.getLogger("trading_file_logger")
-            self._logger.setLevel(logging.INFO)
-            need_handler = True
-            for h in list(self._logger.handlers):
-                try:
-                    if hasattr(h, "baseFilename") and getattr(h, "baseFilename", "") == log_path:
-                        need_handler = False
-                        break
-                except Exception:
-                    pass
-            if need_handler:
-                fh = RotatingFileHandler(log_path, maxBytes=2 * 1024 * 1024, backupCount=3, encoding="utf-8")
-                fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S")
-                fh.setFormatter(fmt)
-                self._logger.addHandler(fh)
-                self._logger.propagate = False
+            # 交易日志文件（按 2MB 轮转）：同样经队列交给后台线程写盘，下单路径不等待磁盘 I/O
+            fh = RotatingFileHandler(os.path.join(base_dir, "trading.log"), maxBytes=2 * 1024 * 1024, backupCount=3, encoding="utf-8")
+            fh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+            self._logger = queued_logger("trading_file_logger", fh)
         except Exception:
             try:
                 self._logger = logging.getLogger("trading_file_logger")
@@ -113,7 +240,7 @@ class TradingEngine:
         self._min_qty: float | None = None  # 交易对最小数量（LOT_SIZE.minQty 或 MARKET_LOT_SIZE.minQty）
         self._min_notional: float | None = None  # 交易对最小名义金额（MIN_NOTIONAL.minNotional）
         # 是否在启动时自动设置双向持仓（默认开启）
-        self.auto_set_dual_side: bool = bool(tcfg.get("auto_set_dual_side", True))
+        self.auto_set_dual_side: bool = _cfg(tcfg, "auto_set_dual_side", True, bool)
         try:
             if not self.test_mode:
                 api_key = str(tcfg.get("api_key") or "")
@@ -134,8 +261,7 @@ class TradingEngine:
                                 self.position = Position(side=side_sync, entry_price=entry_sync, qty=qty_sync, open_fee=0.0)
                                 try:
                                     msg = f"[ACCOUNT] 启动同步持仓: side={side_sync} entry={entry_sync} qty={qty_sync}"
-                                    print(msg)
-                                    self._log(msg)
+                                    self._plog(msg)
                                 except Exception:
                                     pass
                     except Exception:
@@ -193,15 +319,13 @@ class TradingEngine:
                                     self._dual_side = True
                                     try:
                                         msg = "[ACCOUNT] 已自动开启双向持仓 (hedge mode)"
-                                        print(msg)
-                                        self._log(msg)
+                                        self._plog(msg)
                                     except Exception:
                                         pass
                                 else:
                                     try:
                                         msg = "[ACCOUNT] 自动开启双向持仓失败，请检查 API 权限或合约账户状态"
-                                        print(msg)
-                                        self._log(msg)
+                                        self._plog(msg)
                                     except Exception:
                                         pass
                     except Exception:
@@ -213,13 +337,34 @@ class TradingEngine:
         # DB
         self.db_path = os.path.join("db", "trading.db")
         os.makedirs("db", exist_ok=True)
-        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
-        self._db.row_factory = sqlite3.Row
+        # wallet 快照缓冲：成交时仅标记脏，按 wallet_flush_sec 周期写入一行（close()/退出时强制落盘）
+        self.wallet_flush_sec: float = _cfg(tcfg, "wallet_flush_sec", 60.0, float)
+        self._wallet_dirty = False
+        self._wallet_last_flush = time.monotonic()
+        self._closed = False
+        # WAL + synchronous=NORMAL：提交不再每次 fsync，读（统计/最近成交）可与写并发
+        # unsafe_sync=true 时完全关闭同步，仅建议用于回测/批量导入
+        self.unsafe_sync: bool = _cfg(tcfg, "unsafe_sync", False, bool)
+        # 读连接返回普通元组（各查询均按下标取列，无需 sqlite3.Row）
+        self._db = self._connect_db()
         self._init_db()
+        # 单写线程：运行期的写入经队列交给独立连接批量提交，行情回调不再等待磁盘
+        self._write_q: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._writer_loop, name="trading-db-writer", daemon=True)
+        self._writer.start()
         # 初始化余额：从 wallet 表恢复最近余额；若数据库为空，则写入初始余额
         # 这样在程序重启后，页面上的“实时余额”不会回到 initial_balance，
         # 而是延续上次运行的结果（例如 970），与累计的总盈亏保持一致。
         self._restore_balance_from_wallet()
+        # 累计盈亏/手续费/交易次数播种到内存，之后随成交增量更新（先等待启动时入队的 wallet 写入落库）
+        self._sync_writes()
+        self._seed_totals()
+        # 行情处理线程（由 start_tick_worker 启动）：WS 回调只入队，处理在独立线程串行执行
+        self._tick_q: queue.SimpleQueue = queue.SimpleQueue()
+        self._tick_thread: threading.Thread | None = None
+        self._tick_on_processed: Callable[[], None] | None = None
+        self._tick_start_lock = threading.Lock()
+        atexit.register(self.close)
         # 启动时恢复未平仓的持仓信息（保证重启后仍显示当前持仓）
         self._restore_open_position()
         # 实盘模式：用交易所真实持仓覆盖本地持仓，避免重启后本地状态与实盘不一致
@@ -235,84 +380,110 @@ class TradingEngine:
                         # 以 0 记录开仓手续费占位；真实手续费在后续 CLOSE 记录计算净盈亏时体现
                         self.position = Position(side=side, entry_price=entry, qty=qty, open_fee=0.0)
                         # 覆盖 position 表，保证后续重启也能恢复到与实盘一致的持仓
-                        self._clear_position()
-                        self._save_position()
+                        self._write(*self._position_stmts())
                         try:
-                            print(f"[SYNC-POS] from API: side={side} entry={entry} qty={qty}")
+                            logger.info("[SYNC-POS] from API: side=%s entry=%s qty=%s", side, entry, qty)
                         except Exception:
                             pass
         except Exception:
             # 若同步失败，保留本地推断的持仓；状态接口仍会显示实盘的真实持仓
             pass
+        # 状态接口中初始化后不再变化的字段，每次调用直接合并（initial_balance 可被账户轮询更新，不放入）
+        self._status_const = {
+            "symbol": self.symbol,
+            "interval": self.interval,
+            "leverage": self.leverage,
+            "fee_rate": self.fee_rate,
+            "percent": self.percent,
+            # 动态提供均线周期，供前端展示（避免硬编码 5/15）
+            "ema_period": self.ema_period,
+            "ma_period": self.ma_period,
+        }
 
     # --------------------- DB ---------------------
+    def _connect_db(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=" + ("OFF" if self.unsafe_sync else "NORMAL"))
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MB 页缓存
+            conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        except Exception:
+            pass
+        return conn
+
+    def _writer_loop(self):
+        """单写线程：阻塞等待写入单元，取到后顺带取空队列，整批在一个事务内提交。
+
+        队列项：语句元组（一个事务单元）、threading.Event（屏障，提交后置位）或 None（退出）。
+        """
+        conn = self._connect_db()
+        # 写线程独占连接，整个生命周期复用同一游标（语句由连接的预编译缓存复用）
+        cur = conn.cursor()
+        q = self._write_q
+        running = True
+        while running:
+            batch = [q.get()]
+            while True:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            units = []
+            barriers = []
+            for item in batch:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    barriers.append(item)
+                else:
+                    units.append(item)
+            if units:
+                try:
+                    with conn:
+                        for unit in units:
+                            self._exec_unit(cur, unit)
+                except Exception:
+                    # 整批失败时逐单元重试，避免一条坏语句拖累其他写入
+                    for unit in units:
+                        try:
+                            with conn:
+                                self._exec_unit(cur, unit)
+                        except Exception:
+                            logger.exception("[DB] write failed: %s", unit[0][0] if unit else "")
+            for ev in barriers:
+                ev.set()
+        conn.close()
+
+    @staticmethod
+    def _exec_unit(cur: sqlite3.Cursor, unit: tuple):
+        for st in unit:
+            if len(st) == 3:
+                cur.executemany(st[0], st[1])
+            else:
+                cur.execute(st[0], st[1])
+
+    def _write(self, *stmts: tuple):
+        """将若干 (sql, params) 作为一个事务单元交给写线程（(sql, rows, True) 表示 executemany）。"""
+        self._write_q.put(stmts)
+
+    def _sync_writes(self, timeout: float = 5.0) -> bool:
+        """等待此前入队的写入全部提交。"""
+        ev = threading.Event()
+        self._write_q.put(ev)
+        return ev.wait(timeout)
+
     def _init_db(self):
         cur = self._db.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS klines (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                symbol TEXT,
-                interval TEXT,
-                open_time INTEGER,
-                close_time INTEGER,
-                open REAL, high REAL, low REAL, close REAL,
-                volume REAL
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                time INTEGER,
-                symbol TEXT,
-                side TEXT,
-                price REAL,
-                qty REAL,
-                fee REAL,
-                pnl REAL,
-                balance_after REAL
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS wallet (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                time INTEGER,
-                balance REAL
-            )
-            """
-        )
-        # 记录当前未平仓的持仓，便于程序重启后恢复
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS position (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                time INTEGER,
-                side TEXT,
-                entry_price REAL,
-                qty REAL,
-                open_fee REAL
-            )
-            """
-        )
-        # 系统元信息：记录数据库初始化时间，供“交易时长”展示使用
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS meta (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                start_time INTEGER
-            )
-            """
-        )
+        # 建表、旧库迁移与索引一次性提交给 SQLite 解析执行
+        cur.executescript(_SQL_SCHEMA)
         # 若不存在初始化时间，则写入当前时间；存在则沿用
         try:
             cur.execute("SELECT start_time FROM meta ORDER BY id ASC LIMIT 1")
             r = cur.fetchone()
             if not r or (r[0] is None):
-                st = int(time.time() * 1000)
+                st = now_ms()
                 cur.execute("INSERT INTO meta(start_time) VALUES (?)", (st,))
                 self.db_start_ms = st
             else:
@@ -320,11 +491,11 @@ class TradingEngine:
         except Exception:
             # 兜底：若查询失败则以当前时间作为起点（不会影响已存在数据）
             try:
-                st = int(time.time() * 1000)
+                st = now_ms()
                 cur.execute("INSERT INTO meta(start_time) VALUES (?)", (st,))
                 self.db_start_ms = st
             except Exception:
-                self.db_start_ms = int(time.time() * 1000)
+                self.db_start_ms = now_ms()
         self._db.commit()
 
     def _restore_balance_from_wallet(self):
@@ -341,10 +512,15 @@ class TradingEngine:
         try:
             cur = self._db.cursor()
             if self.test_mode:
-                cur.execute("SELECT balance FROM wallet ORDER BY id DESC LIMIT 1")
+                cur.execute("SELECT balance, time FROM wallet ORDER BY id DESC LIMIT 1")
                 row = cur.fetchone()
                 if row and row[0] is not None:
                     self.balance = float(row[0])
+                    # wallet 为周期性快照：若之后还有成交（异常退出未及落盘），以最近成交后的余额为准
+                    cur.execute("SELECT balance_after, time FROM trades ORDER BY id DESC LIMIT 1")
+                    tr = cur.fetchone()
+                    if tr and tr[0] is not None and int(tr[1] or 0) > int(row[1] or 0):
+                        self.balance = float(tr[0])
                 else:
                     self._insert_wallet()
             else:
@@ -365,8 +541,8 @@ class TradingEngine:
         """
         try:
             cur = self._db.cursor()
-            # 1) 优先读取 position 表最新记录
-            cur.execute("SELECT side, entry_price, qty, open_fee FROM position ORDER BY id DESC LIMIT 1")
+            # 1) 优先读取 position 表（单行）
+            cur.execute("SELECT side, entry_price, qty, open_fee FROM position WHERE id = 1")
             row = cur.fetchone()
             if row and row[0] is not None:
                 self.position = Position(side=row[0], entry_price=float(row[1]), qty=float(row[2]), open_fee=float(row[3] or 0.0))
@@ -377,78 +553,101 @@ class TradingEngine:
             t = cur.fetchone()
             if t:
                 last_open_id = int(t[0])
-                # 检查是否存在晚于该开仓记录的平仓记录
-                cur.execute("SELECT COUNT(1) FROM trades WHERE id > ? AND side = 'CLOSE'", (last_open_id,))
-                closed_count = int(cur.fetchone()[0] or 0)
-                if closed_count == 0:
+                # 检查是否存在晚于该开仓记录的平仓记录（EXISTS 命中首条即停止，无需计数）
+                cur.execute("SELECT EXISTS(SELECT 1 FROM trades WHERE side = 'CLOSE' AND id > ?)", (last_open_id,))
+                if not cur.fetchone()[0]:
                     self.position = Position(side=str(t[1]), entry_price=float(t[2]), qty=float(t[3]), open_fee=float(t[4] or 0.0))
         except Exception:
             pass
 
-    def _insert_kline(self, k: dict):
-        cur = self._db.cursor()
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO klines(symbol, interval, open_time, close_time, open, high, low, close, volume)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                self.symbol,
-                self.interval,
-                int(k["open_time"]),
-                int(k["close_time"]),
-                float(k["open"]),
-                float(k["high"]),
-                float(k["low"]),
-                float(k["close"]),
-                float(k.get("volume", 0.0)),
-            ),
+    def _kline_row(self, k: dict) -> tuple:
+        return (
+            self.symbol,
+            self.interval,
+            int(k["open_time"]),
+            int(k["close_time"]),
+            float(k["open"]),
+            float(k["high"]),
+            float(k["low"]),
+            float(k["close"]),
+            float(k.get("volume", 0.0)),
         )
-        self._db.commit()
 
-    def _insert_trade(self, side: str, price: float, qty: float, fee: float, pnl: float):
-        cur = self._db.cursor()
-        cur.execute(
-            """
-            INSERT INTO trades(time, symbol, side, price, qty, fee, pnl, balance_after)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (int(time.time() * 1000), self.symbol, side, price, qty, fee, pnl, self.balance),
+    def _insert_kline(self, k: dict):
+        self._write((_SQL_INSERT_KLINE, self._kline_row(k)))
+
+    def _trade_insert_stmt(self, side: str, price: float, qty: float, fee: float, pnl: float) -> tuple:
+        """成交记录的写入语句（余额取当前值，调用方需先更新余额）。"""
+        return (
+            _SQL_INSERT_TRADE,
+            (now_ms(), self.symbol, side, price, qty, fee, pnl, self.balance),
         )
-        self._db.commit()
 
-    def _save_position(self):
-        """将当前未平仓持仓写入 position 表（只追加一条最新记录）。"""
-        try:
-            if self.position.side is None:
-                return
-            cur = self._db.cursor()
-            cur.execute(
-                "INSERT INTO position(time, side, entry_price, qty, open_fee) VALUES (?, ?, ?, ?, ?)",
-                (int(time.time() * 1000), self.position.side, float(self.position.entry_price or 0.0), float(self.position.qty or 0.0), float(self.position.open_fee or 0.0)),
-            )
-            self._db.commit()
-        except Exception:
-            pass
+    def _position_stmts(self) -> list[tuple]:
+        """覆盖 position 表的语句：有持仓时单条 upsert 写入 id=1 行，无持仓时删除该行。"""
+        pos = self.position
+        if pos.side is None:
+            return [(_SQL_CLEAR_POSITION, ())]
+        return [(
+            _SQL_UPSERT_POSITION,
+            (now_ms(), pos.side, float(pos.entry_price or 0.0), float(pos.qty or 0.0), float(pos.open_fee or 0.0)),
+        )]
+
+    def _insert_wallet(self):
+        self._write((_SQL_INSERT_WALLET, (now_ms(), self.balance)))
+
+    def _flush_wallet(self, *, force: bool = False):
+        """余额有变化且距上次写入超过 wallet_flush_sec（或 force）时写入一行 wallet 快照。
 
-    def _clear_position(self):
-        """清空 position 表（表示当前无未平仓持仓）。"""
+        wallet 表只读取首条（基准资金）与末条（重启恢复），中间快照无需逐笔写入。
+        """
+        if not self._wallet_dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._wallet_last_flush < self.wallet_flush_sec:
+            return
+        self._insert_wallet()
+        self._wallet_dirty = False
+        self._wallet_last_flush = now
+
+    def close(self):
+        """落盘缓冲的 wallet 快照、等待写线程提交完毕并关闭数据库连接（可重复调用，进程退出时自动执行）。"""
+        if self._closed:
+            return
+        self._closed = True
+        # 先停行情处理线程，保证其后不再产生新的写入
+        if self._tick_thread is not None:
+            self._tick_q.put(None)
+            self._tick_thread.join(timeout=5.0)
+        self._flush_wallet(force=True)
+        # 通知写线程取空队列后退出
+        self._write_q.put(None)
+        self._writer.join(timeout=5.0)
         try:
-            cur = self._db.cursor()
-            cur.execute("DELETE FROM position")
-            self._db.commit()
+            self._db.close()
         except Exception:
             pass
 
-    def _insert_wallet(self):
+    # --------------------- Aggregates ---------------------
+    def _seed_totals(self):
+        """启动时从数据库播种累计统计；此后由开/平仓处增量维护，totals() 不再查库。"""
         cur = self._db.cursor()
-        cur.execute(
-            "INSERT INTO wallet(time, balance) VALUES (?, ?)",
-            (int(time.time() * 1000), self.balance),
-        )
-        self._db.commit()
+        # 一次扫描 trades 取全部聚合：平仓净盈亏总和与平仓次数（不含开仓的负手续费记录）、开/平仓手续费总和，
+        # 并以子查询带出 wallet 首条余额
+        cur.execute(_SQL_SEED_TOTALS)
+        row = cur.fetchone()
+        self._agg_total_pnl = float(row[0] or 0.0)
+        self._agg_trade_count = int(row[1] or 0)
+        self._agg_total_fee = float(row[2] or 0.0)
+        self._base_balance = float(row[3]) if row[3] is not None else None
+
+    def _first_wallet_balance(self) -> float | None:
+        """wallet 首条记录的余额（写入后不再变化）；不存在时返回 None。"""
+        cur = self._db.cursor()
+        cur.execute("SELECT balance FROM wallet ORDER BY id ASC LIMIT 1")
+        row = cur.fetchone()
+        return float(row[0]) if row and row[0] is not None else None
 
-    # --------------------- Aggregates ---------------------
     def totals(self) -> dict:
         """统计总盈亏、总手续费与总利润率。
 
@@ -457,185 +656,189 @@ class TradingEngine:
         - 总手续费：自程序初始化数据库以来，所有开/平仓记录的手续费之和（trades.fee）。
         - 交易次数：自程序初始化数据库以来，所有平仓记录的次数（每次平仓计 1 次）。
         - 总利润率：总盈亏除以基准资金，其中基准资金取 wallet 表的第一条记录；若不存在，则取配置的 initial_balance。
-        """
-        cur = self._db.cursor()
-        # 平仓净盈亏总和（不含开仓的负手续费记录）
-        cur.execute("SELECT COALESCE(SUM(pnl), 0.0) FROM trades WHERE side = 'CLOSE'")
-        total_pnl = float(cur.fetchone()[0] or 0.0)
-
-        # 开/平仓手续费总和
-        cur.execute("SELECT COALESCE(SUM(fee), 0.0) FROM trades")
-        total_fee = float(cur.fetchone()[0] or 0.0)
-
-        # 交易次数：平仓记录计数
-        cur.execute("SELECT COUNT(1) FROM trades WHERE side = 'CLOSE'")
-        trade_count = int(cur.fetchone()[0] or 0)
 
+        各项为内存中的累计值（见 _seed_totals），每次调用仅做算术；返回原始浮点值，展示精度由接口层处理。
+        """
+        total_pnl = self._agg_total_pnl
         # 基准资金：wallet 首条记录，否则使用 initial_balance
-        cur.execute("SELECT balance FROM wallet ORDER BY id ASC LIMIT 1")
-        row = cur.fetchone()
-        base_balance = float(row[0]) if row and row[0] is not None else float(self.initial_balance)
+        base_balance = self._base_balance
+        if base_balance is None:
+            base_balance = self._base_balance = self._first_wallet_balance()
+            if base_balance is None:
+                base_balance = float(self.initial_balance)
 
         roi = (total_pnl / base_balance) if base_balance > 0 else 0.0
         return {
-            "total_pnl": round(total_pnl, 6),
-            "total_fee": round(total_fee, 6),
-            "trade_count": trade_count,
+            "total_pnl": total_pnl,
+            "total_fee": self._agg_total_fee,
+            "trade_count": self._agg_trade_count,
             "roi": roi,
             "base_balance": base_balance,
         }
 
     # --------------------- Data & Indicators ---------------------
     def _recalc_indicators(self):
-        self.ema_list = ema(self.closes, self.ema_period)
-        self.ma_list = sma(self.closes, self.ma_period)
+        """全量计算指标，仅用于历史导入时播种；实时路径走 _push_close 增量更新。"""
+        closes = list(self.closes)
+        self.ema_list = deque(ema(closes, self.ema_period), maxlen=self._series_cap)
+        self.ma_list = deque(sma(closes, self.ma_period), maxlen=self._series_cap)
+        self._ma_sum = sum(closes[-self.ma_period:])
 
-    def _trim_series_if_needed(self, *, recalc: bool = False):
-        try:
-            maxlen = int(getattr(self, "series_maxlen", 0))
-        except Exception:
-            maxlen = 0
-        if maxlen <= 0:
-            if recalc:
-                self._recalc_indicators()
-            return
-        n = len(self.timestamps)
-        if n <= maxlen:
-            if recalc:
-                self._recalc_indicators()
-            return
-        keep = maxlen
-        self.timestamps = self.timestamps[-keep:]
-        self.closes = self.closes[-keep:]
-        if recalc:
-            self._recalc_indicators()
+    def _push_close(self, price: float, *, replace_last: bool) -> None:
+        """写入最新收盘价并增量更新 EMA/MA。
+
+        replace_last=True 表示同一根 K 线内的价格更新：替换最后一个值，
+        EMA 基于上一根的 EMA 重新推进，MA 的滚动和按差值修正（O(1)）；
+        新增一根时 MA 窗口和重新求和（每根 K 线一次 O(ma_period)），不累积误差。
+        各序列为同长的定长 deque，新增一根时会同步挤出最旧的一根。
+        """
+        closes = self.closes
+        ema_list = self.ema_list
+        ma_list = self.ma_list
+        ep = self.ema_period
+        mp = self.ma_period
+        if replace_last and closes:
+            if closes[-1] == price:
+                # 同一根 K 线内价格未变（重复推送），指标不变，直接跳过
+                return
+            self._ma_sum += price - closes[-1]
+            closes[-1] = price
+            ema_list.pop()
+            ma_list.pop()
         else:
-            try:
-                self.ema_list = self.ema_list[-keep:] if self.ema_list else []
-                self.ma_list = self.ma_list[-keep:] if self.ma_list else []
-            except Exception:
-                self._recalc_indicators()
+            closes.append(price)
+            # 每根新 K 线重新求和一次窗口（O(ma_period)），避免长期运行中滚动加减累积浮点误差；
+            # 同一根 K 线内的价格更新仍按差值 O(1) 修正
+            self._ma_sum = sum(islice(reversed(closes), mp))
+        n = len(closes)
+        if n < ep:
+            ema_list.append(None)
+        elif n == ep:
+            # 以首个完整窗口的 SMA 作为初始 EMA
+            ema_list.append(sum(closes) / ep)
+        else:
+            prev = ema_list[-1]
+            ema_list.append(prev + self._ema_k * (price - prev))
+        ma_list.append(self._ma_sum / mp if n >= mp else None)
 
     def ingest_historical(self, klines: list[dict]):
-        for k in klines:
-            self._insert_kline(k)
-            self.timestamps.append(k["close_time"])
-            self.closes.append(float(k["close"]))
-        # 计算完整指标并按需裁剪
-        self._trim_series_if_needed(recalc=True)
+        # 单个事务批量写入：N 根 K 线只提交一次
+        self._write((_SQL_INSERT_KLINE, [self._kline_row(k) for k in klines], True))
+        # 启动阶段：等待历史数据落库后再返回，保证图表接口立即可读
+        self._sync_writes(timeout=30.0)
+        with self._series_lock:
+            self.timestamps.extend(k["close_time"] for k in klines)
+            self.closes.extend(float(k["close"]) for k in klines)
+            # 计算完整指标（序列长度已由定长 deque 限制）
+            self._recalc_indicators()
+
+    def series_snapshot(self) -> tuple[tuple, tuple, tuple, tuple]:
+        """返回 (timestamps, closes, ema, ma) 的不可变拷贝，供 Web 等其他线程安全读取。"""
+        with self._series_lock:
+            return tuple(self.timestamps), tuple(self.closes), tuple(self.ema_list), tuple(self.ma_list)
 
     def on_realtime_kline(self, k: dict):
         # 未收盘也参与计算（更贴近实时策略）；收盘时落库
         price = float(k["close"])
         self.current_price = price
+        # 到期时落盘缓冲的余额快照（无变化时仅一次布尔判断）
+        self._flush_wallet()
         close_time = int(k["close_time"])
+        is_final = bool(k.get("is_final", False))
 
-        # 指标计算的数据推进策略
-        if self.use_closed_only:
-            # 仅在收盘事件时推进与更新，未收盘不影响均线计算
-            if bool(k.get("is_final", False)):
-                # 新K线或当前K线收盘
-                did_append = (not self.timestamps or close_time != self.timestamps[-1])
-                if did_append:
-                    self.timestamps.append(close_time)
-                    self.closes.append(price)
-                else:
-                    self.closes[-1] = price
-                self._trim_series_if_needed(recalc=True)
-        else:
-            # 未收盘也进入计算：更灵敏，但与交易所图略有差异
-            did_append = (not self.timestamps or close_time != self.timestamps[-1])
-            if did_append:
-                self.timestamps.append(close_time)
-                self.closes.append(price)
-            else:
-                self.closes[-1] = price
-            self._trim_series_if_needed(recalc=True)
+        # 同一根未收盘 K 线内价格未变：指标与信号均不会变化，仅刷新展示用的高/低/量后返回
+        if (not is_final) and close_time == self._last_tick_close_time and price == self._last_tick_price:
+            lk = self.latest_kline
+            if lk is not None:
+                try:
+                    lk["high"] = k["high"]
+                    lk["low"] = k["low"]
+                    lk["volume"] = k["volume"]
+                except KeyError:
+                    pass
+            return
+        self._last_tick_close_time = close_time
+        self._last_tick_price = price
+        # 热路径中多次使用的属性绑定为局部变量
+        use_closed_only = self.use_closed_only
+        timestamps = self.timestamps
 
+        # 指标计算的数据推进策略：仅收盘模式下只在收盘事件推进（未收盘不影响均线计算）；
+        # 否则未收盘也进入计算，更灵敏，但与交易所图略有差异
+        if is_final or not use_closed_only:
+            # 新K线追加，同一根K线则替换最后一个值
+            with self._series_lock:
+                did_append = (not timestamps or close_time != timestamps[-1])
+                if did_append:
+                    timestamps.append(close_time)
+                self._push_close(price, replace_last=not did_append)
 
         # 保存未收盘完整K线用于前端展示
+        # WS 解析与价格轮询回退均已以 float 提供 OHLCV，这里直接取用；收盘价复用上面已转换的 price
         try:
             self.latest_kline = {
                 "open_time": int(k.get("open_time", close_time)),
                 "close_time": close_time,
-                "open": float(k.get("open", price)),
-                "high": float(k.get("high", price)),
-                "low": float(k.get("low", price)),
-                "close": float(k.get("close", price)),
-                "volume": float(k.get("volume", 0.0)),
-                "is_final": bool(k.get("is_final", False)),
+                "open": k.get("open", price),
+                "high": k.get("high", price),
+                "low": k.get("low", price),
+                "close": price,
+                "volume": k.get("volume", 0.0),
+                "is_final": is_final,
             }
-        except Exception:
+        except (TypeError, ValueError):
             pass
 
-        # 仅在最近两个点有效时评估信号
-        cross = crossover(self.ema_list, self.ma_list)
+        # 仅收盘模式下未收盘 tick 不推进指标，交叉结果与上次收盘时相同（交叉日志已在收盘时记录），
+        # 只需做实盘持仓同步，跳过信号评估
+        if use_closed_only and (not is_final):
+            _tick_logger.debug("[TICK] price=%.2f (waiting for close)", price)
+            self._sync_manual_position(price)
+            return
 
-        # 额外条件：价格相对均线、均线趋势
-        ema_rising = is_rising(self.ema_list, lookback=3)
-        ema_curr = self.ema_list[-1]
-        ma_curr = self.ma_list[-1]
+        ema_list = self.ema_list
+        ma_list = self.ma_list
+        ema_curr = ema_list[-1] if ema_list else None
+        ma_curr = ma_list[-1] if ma_list else None
         if ema_curr is None or ma_curr is None:
             return
+        # 仅在最近两个点有效时评估信号：直接读取末两点（deque 两端访问 O(1)），不再构造 CrossSignal
+        golden = death = False
+        if len(ema_list) >= 2 and len(ma_list) >= 2:
+            ema_prev = ema_list[-2]
+            ma_prev = ma_list[-2]
+            if ema_prev is not None and ma_prev is not None:
+                golden, death = cross_flags(ema_prev - ma_prev, ema_curr - ma_curr)
 
         # 交叉日志：仅在状态从非交叉变为金叉/死叉或在金叉↔死叉切换时记录，避免秒级刷屏
         try:
-            cross_tag = ("GOLDEN" if cross.golden_cross else ("DEATH" if cross.death_cross else None))
+            cross_tag = ("GOLDEN" if golden else ("DEATH" if death else None))
             if cross_tag and (cross_tag != self._last_cross_tag):
-                self._log(f"[CROSS] ts={close_time} final={bool(k.get('is_final', False))} golden={cross.golden_cross} death={cross.death_cross} price={price:.2f} ema={ema_curr:.2f} ma={ma_curr:.2f}")
+                self._log("[CROSS] ts=%s final=%s golden=%s death=%s price=%.2f ema=%.2f ma=%.2f", close_time, is_final, golden, death, price, ema_curr, ma_curr)
                 self._last_cross_tag = cross_tag
         except Exception:
             pass
 
         # 轻量日志，便于观察实时更新
-        if self.enable_tick_log:
-            try:
-                print(f"[TICK] price={price:.2f} ema={ema_curr:.2f} ma={ma_curr:.2f} cross(g={cross.golden_cross}, d={cross.death_cross})")
-            except Exception:
-                pass
-
-        # 实盘手动持仓同步：当本地无持仓时若API检测到仓位，立即同步
-        try:
-            if (not self.test_mode) and self._client_auth and (self.position.side is None):
-                rp_sync = self._client_auth.get_futures_position(self.symbol)
-                if isinstance(rp_sync, dict) and rp_sync.get("positionAmt") is not None:
-                    amt_sync = float(rp_sync.get("positionAmt"))
-                    if abs(amt_sync) > 0:
-                        side_sync = ("LONG" if amt_sync > 0 else "SHORT")
-                        entry_sync = float(rp_sync.get("entryPrice") or price)
-                        qty_sync = abs(amt_sync)
-                        self.position = Position(side=side_sync, entry_price=entry_sync, qty=qty_sync, open_fee=0.0)
-                        # 覆盖本地 position 表，保证重启后也能恢复
-                        self._clear_position()
-                        self._save_position()
-                        try:
-                            self._log(f"[SYNC-POS] manual detected: side={side_sync} entry={entry_sync:.2f} qty={qty_sync:.6f}")
-                        except Exception:
-                            pass
-        except Exception:
-            pass
+        _tick_logger.debug("[TICK] price=%.2f ema=%.2f ma=%.2f cross(g=%s, d=%s)", price, ema_curr, ma_curr, golden, death)
 
-        # 若配置为仅收盘交易，则在未收盘事件直接退出（但仍记录交叉日志）
-        if self.use_closed_only and (not bool(k.get("is_final", False))):
-            return
+        self._sync_manual_position(price)
 
         if self.position.side is None:
             # 开仓逻辑（仅收盘交叉触发），并在同一事件内执行“先平反向→再开新仓”
-            cond_long = bool(cross.golden_cross)
-            cond_short = bool(cross.death_cross)
+            cond_long = bool(golden)
+            cond_short = bool(death)
             if cond_long:
-                if self.enable_signal_debug_log:
-                    print(f"[OPEN-CHECK] LONG ok: golden cross at close")
+                _signal_logger.debug("[OPEN-CHECK] LONG ok: golden cross at close")
                 # 仅在收盘事件且实盘时执行反手处理
-                if bool(k.get("is_final", False)) and (not self.test_mode) and self._client_auth:
+                if is_final and (not self.test_mode) and self._client_auth:
                     try:
                         # 1) 若实盘持有空仓，先平空再尝试开多
-                        rp_short = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT")
+                        rp_short = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT", fresh=True)
                         has_short = bool(rp_short and rp_short.get("positionAmt") is not None and abs(float(rp_short.get("positionAmt"))) > 0)
                         if has_short:
                             msg_rev = "[REVERSAL] 收盘金叉：检测到实盘持有空仓，先平空再开多"
-                            print(msg_rev)
-                            self._log(msg_rev)
+                            self._plog(msg_rev)
                             # 建立本地空仓以便执行标准平仓流程
                             try:
                                 self.position = Position(
@@ -649,26 +852,23 @@ class TradingEngine:
                             closed = self._close_with_confirm(prev_side="SHORT", price=price)
                             if not closed:
                                 msg_skip = "[REVERSAL] 平空未确认成功，跳过本次反向开多"
-                                print(msg_skip)
-                                self._log(msg_skip)
+                                self._plog(msg_skip)
                             else:
                                 # 平空成功后，若已存在多仓则跳过开多
-                                rp_long2 = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG")
+                                rp_long2 = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG", fresh=True)
                                 has_long2 = bool(rp_long2 and rp_long2.get("positionAmt") is not None and abs(float(rp_long2.get("positionAmt"))) > 0)
                                 if has_long2:
                                     msg2 = "[OPEN-SKIP] 检测到实盘持有多仓，跳过开多"
-                                    print(msg2)
-                                    self._log(msg2)
+                                    self._plog(msg2)
                                 else:
                                     self._open_with_confirm("LONG", price)
                         else:
                             # 2) 未持空：若已持多则跳过，否则直接开多
-                            rp_long = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG")
+                            rp_long = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG", fresh=True)
                             has_long = bool(rp_long and rp_long.get("positionAmt") is not None and abs(float(rp_long.get("positionAmt"))) > 0)
                             if has_long:
                                 msg = "[OPEN-SKIP] 检测到实盘持有多仓，跳过开多"
-                                print(msg)
-                                self._log(msg)
+                                self._plog(msg)
                             else:
                                 self._open_with_confirm("LONG", price)
                     except Exception:
@@ -678,18 +878,16 @@ class TradingEngine:
                     # 非实盘或未收盘：直接按信号开多
                     self._open_with_confirm("LONG", price)
             elif cond_short:
-                if self.enable_signal_debug_log:
-                    print(f"[OPEN-CHECK] SHORT ok: death cross at close")
+                _signal_logger.debug("[OPEN-CHECK] SHORT ok: death cross at close")
                 # 仅在收盘事件且实盘时执行反手处理
-                if bool(k.get("is_final", False)) and (not self.test_mode) and self._client_auth:
+                if is_final and (not self.test_mode) and self._client_auth:
                     try:
                         # 1) 若实盘持有多仓，先平多再尝试开空
-                        rp_long = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG")
+                        rp_long = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG", fresh=True)
                         has_long = bool(rp_long and rp_long.get("positionAmt") is not None and abs(float(rp_long.get("positionAmt"))) > 0)
                         if has_long:
                             msg_rev = "[REVERSAL] 收盘死叉：检测到实盘持有多仓，先平多再开空"
-                            print(msg_rev)
-                            self._log(msg_rev)
+                            self._plog(msg_rev)
                             # 建立本地多仓以便执行标准平仓流程
                             try:
                                 self.position = Position(
@@ -703,26 +901,23 @@ class TradingEngine:
                             closed = self._close_with_confirm(prev_side="LONG", price=price)
                             if not closed:
                                 msg_skip = "[REVERSAL] 平多未确认成功，跳过本次反向开空"
-                                print(msg_skip)
-                                self._log(msg_skip)
+                                self._plog(msg_skip)
                             else:
                                 # 平多成功后，若已存在空仓则跳过开空
-                                rp_short2 = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT")
+                                rp_short2 = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT", fresh=True)
                                 has_short2 = bool(rp_short2 and rp_short2.get("positionAmt") is not None and abs(float(rp_short2.get("positionAmt"))) > 0)
                                 if has_short2:
                                     msg2 = "[OPEN-SKIP] 检测到实盘持有空仓，跳过开空"
-                                    print(msg2)
-                                    self._log(msg2)
+                                    self._plog(msg2)
                                 else:
                                     self._open_with_confirm("SHORT", price)
                         else:
                             # 2) 未持多：若已持空则跳过，否则直接开空
-                            rp_short = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT")
+                            rp_short = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT", fresh=True)
                             has_short = bool(rp_short and rp_short.get("positionAmt") is not None and abs(float(rp_short.get("positionAmt"))) > 0)
                             if has_short:
                                 msg = "[OPEN-SKIP] 检测到实盘持有空仓，跳过开空"
-                                print(msg)
-                                self._log(msg)
+                                self._plog(msg)
                             else:
                                 self._open_with_confirm("SHORT", price)
                     except Exception:
@@ -743,27 +938,25 @@ class TradingEngine:
             #    - 该反向开仓不再额外检查价格相对均线或斜率条件，严格按交叉信号执行。
             #    - 说明：use_closed_only=true 时，交叉仅在收盘触发；false 时，未收盘也可能触发，频次更高。
             if self.position.side == "LONG":
-                if cross.death_cross:
+                if death:
                     # 死叉：收盘时严格检查实盘是否持有多仓
-                    if bool(k.get("is_final", False)) and (not self.test_mode) and self._client_auth:
+                    if is_final and (not self.test_mode) and self._client_auth:
                         try:
-                            rp_long = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG")
+                            rp_long = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG", fresh=True)
                             has_long = bool(rp_long and rp_long.get("positionAmt") is not None and abs(float(rp_long.get("positionAmt"))) > 0)
                             if not has_long:
                                 msg = "[CLOSE-SKIP] 未持有多仓，跳过平多交易"
-                                print(msg)
-                                self._log(msg)
+                                self._plog(msg)
                                 # 若实盘已无多仓，视为已清仓：同步本地为无持仓，并直接尝试反手开空
                                 try:
-                                    self.position = Position(side=None, entry_price=None, qty=None, open_fee=None)
+                                    self.position = _FLAT
                                 except Exception:
                                     pass
-                                rp_short2 = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT")
+                                rp_short2 = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT", fresh=True)
                                 has_short2 = bool(rp_short2 and rp_short2.get("positionAmt") is not None and abs(float(rp_short2.get("positionAmt"))) > 0)
                                 if has_short2:
                                     msg2 = "[OPEN-SKIP] 检测到实盘持有空仓，跳过开空"
-                                    print(msg2)
-                                    self._log(msg2)
+                                    self._plog(msg2)
                                 else:
                                     self._open_with_confirm("SHORT", price)
                             else:
@@ -775,12 +968,11 @@ class TradingEngine:
                                 closed = self._close_with_confirm(prev_side="LONG", price=price)
                                 if closed:
                                     # 平多后，若已存在空仓则跳过开空
-                                    rp_short2 = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT")
+                                    rp_short2 = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT", fresh=True)
                                     has_short2 = bool(rp_short2 and rp_short2.get("positionAmt") is not None and abs(float(rp_short2.get("positionAmt"))) > 0)
                                     if has_short2:
                                         msg2 = "[OPEN-SKIP] 检测到实盘持有空仓，跳过开空"
-                                        print(msg2)
-                                        self._log(msg2)
+                                        self._plog(msg2)
                                     else:
                                         self._open_with_confirm("SHORT", price)
                         except Exception:
@@ -793,27 +985,25 @@ class TradingEngine:
                         if closed:
                             self._open_with_confirm("SHORT", price)
             elif self.position.side == "SHORT":
-                if cross.golden_cross:
+                if golden:
                     # 金叉：收盘时严格检查实盘是否持有空仓
-                    if bool(k.get("is_final", False)) and (not self.test_mode) and self._client_auth:
+                    if is_final and (not self.test_mode) and self._client_auth:
                         try:
-                            rp_short = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT")
+                            rp_short = self._client_auth.get_futures_position(self.symbol, prefer_side="SHORT", fresh=True)
                             has_short = bool(rp_short and rp_short.get("positionAmt") is not None and abs(float(rp_short.get("positionAmt"))) > 0)
                             if not has_short:
                                 msg = "[CLOSE-SKIP] 未持有空仓，跳过平空交易"
-                                print(msg)
-                                self._log(msg)
+                                self._plog(msg)
                                 # 若实盘已无空仓，视为已清仓：同步本地为无持仓，并直接尝试反手开多
                                 try:
-                                    self.position = Position(side=None, entry_price=None, qty=None, open_fee=None)
+                                    self.position = _FLAT
                                 except Exception:
                                     pass
-                                rp_long2 = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG")
+                                rp_long2 = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG", fresh=True)
                                 has_long2 = bool(rp_long2 and rp_long2.get("positionAmt") is not None and abs(float(rp_long2.get("positionAmt"))) > 0)
                                 if has_long2:
                                     msg2 = "[OPEN-SKIP] 检测到实盘持有多仓，跳过开多"
-                                    print(msg2)
-                                    self._log(msg2)
+                                    self._plog(msg2)
                                 else:
                                     self._open_with_confirm("LONG", price)
                             else:
@@ -825,12 +1015,11 @@ class TradingEngine:
                                 closed = self._close_with_confirm(prev_side="SHORT", price=price)
                                 if closed:
                                     # 平空后，若已存在多仓则跳过开多
-                                    rp_long2 = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG")
+                                    rp_long2 = self._client_auth.get_futures_position(self.symbol, prefer_side="LONG", fresh=True)
                                     has_long2 = bool(rp_long2 and rp_long2.get("positionAmt") is not None and abs(float(rp_long2.get("positionAmt"))) > 0)
                                     if has_long2:
                                         msg2 = "[OPEN-SKIP] 检测到实盘持有多仓，跳过开多"
-                                        print(msg2)
-                                        self._log(msg2)
+                                        self._plog(msg2)
                                     else:
                                         self._open_with_confirm("LONG", price)
                         except Exception:
@@ -844,234 +1033,243 @@ class TradingEngine:
                             self._open_with_confirm("LONG", price)
 
         # 收盘时落库
-        if bool(k.get("is_final", False)):
+        if is_final:
             self._insert_kline(k)
 
+    def start_tick_worker(self, on_processed: Callable[[], None] | None = None) -> None:
+        """启动行情处理线程：之后经 submit_kline 投递的 K 线在该线程内依次交给 on_realtime_kline。
+
+        - on_processed: 每处理完一批积压的 K 线后在行情线程上回调一次，须轻量（如仅投递刷新通知）
+        WS 回调线程只做一次字典拷贝与入队，指标/信号/下单请求都不再阻塞 socket 读取。
+        线程已启动（含 submit_kline 的惰性启动）时仅更新回调。
+        """
+        with self._tick_start_lock:
+            if on_processed is not None:
+                self._tick_on_processed = on_processed
+            if self._tick_thread is not None:
+                return
+            self._tick_thread = threading.Thread(target=self._tick_loop, name="trading-tick", daemon=True)
+            self._tick_thread.start()
+
+    def submit_kline(self, k: dict) -> None:
+        """投递一条实时 K 线给行情处理线程（先拷贝，调用方可继续复用原字典）；线程未启动时惰性启动。"""
+        if self._tick_thread is None:
+            self.start_tick_worker()
+        self._tick_q.put(dict(k))
+
+    def _tick_loop(self):
+        """行情处理线程：阻塞取一条后顺带取空队列，逐条处理。
+
+        积压时同一根未收盘 K 线只处理最新一条（WS 推送的高/低/量为累计值，中间 tick 可直接丢弃），
+        收盘 tick 始终处理。队列项为 None 时退出。
+        """
+        q = self._tick_q
+        running = True
+        while running:
+            batch = [q.get()]
+            while True:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            last = len(batch) - 1
+            for i, k in enumerate(batch):
+                if k is None:
+                    running = False
+                    break
+                if i < last and not k.get("is_final"):
+                    nxt = batch[i + 1]
+                    if nxt is not None and nxt.get("close_time") == k.get("close_time"):
+                        continue
+                try:
+                    self.on_realtime_kline(k)
+                except Exception:
+                    logger.exception("[TICK] process kline failed")
+            cb = self._tick_on_processed
+            if running and cb is not None:
+                try:
+                    cb()
+                except Exception:
+                    pass
+
+    def _sync_manual_position(self, price: float) -> None:
+        """实盘手动持仓同步：当本地无持仓时若API检测到仓位，立即同步。
+
+        查询为同步 HTTPS 请求，按 pos_sync_interval_sec 节流，避免每个 tick 都阻塞在网络往返上。
+        """
+        try:
+            if (not self.test_mode) and self._client_auth and (self.position.side is None):
+                now = time.monotonic()
+                if now - self._pos_sync_last < self.pos_sync_interval_sec:
+                    return
+                self._pos_sync_last = now
+                rp_sync = self._client_auth.get_futures_position(self.symbol)
+                if isinstance(rp_sync, dict) and rp_sync.get("positionAmt") is not None:
+                    amt_sync = float(rp_sync.get("positionAmt"))
+                    if abs(amt_sync) > 0:
+                        side_sync = ("LONG" if amt_sync > 0 else "SHORT")
+                        entry_sync = float(rp_sync.get("entryPrice") or price)
+                        qty_sync = abs(amt_sync)
+                        self.position = Position(side=side_sync, entry_price=entry_sync, qty=qty_sync, open_fee=0.0)
+                        # 覆盖本地 position 表，保证重启后也能恢复
+                        self._write(*self._position_stmts())
+                        try:
+                            self._log("[SYNC-POS] manual detected: side=%s entry=%.2f qty=%.6f", side_sync, entry_sync, qty_sync)
+                        except Exception:
+                            pass
+        except Exception:
+            pass
+
     # --------------------- Trading Logic ---------------------
     def _notional_and_qty(self, price: float) -> tuple[float, float]:
         # 每次开仓金额 = 保证金余额 * 开仓比例 * 杠杆
         # 说明：用户要求以“保证金余额”（totalMarginBalance）为基准，而非钱包余额。
-        base_amount = self.initial_balance * self.percent
-        notional = base_amount * self.leverage
-        qty = notional / price
-        # 步进对齐工具
-        def floor_to_step(x: float, step: float) -> float:
-            return (math.floor(x / step)) * step
-        def ceil_to_step(x: float, step: float) -> float:
-            return (math.ceil(x / step)) * step
+        notional = self.initial_balance * self.percent * self.leverage
+        # _step_size / _min_notional 在初始化加载过滤器时已校验为正数（或 None），此处直接使用
+        step = self._step_size
         # 1) 先按步进向下取整，避免 LOT_SIZE 步进拒单
-        try:
-            step = float(self._step_size or 0.001)
-            if step > 0:
-                qty = floor_to_step(qty, step)
-        except Exception:
-            pass
+        qty = math.floor(notional / price / step) * step
         # 2) 跳过最小数量限制，按步进与最小名义约束
         # 说明：用户手动下单时交易所未强制 minQty，这里不再抬高数量到 minQty。
         # 仍保留 LOT_SIZE 的步进与 MIN_NOTIONAL 校验，避免被拒单。
         # （若交易所返回数量过小错误，可在配置中调高 percent/leverage）
-        # 此处不做数量上调处理，直接进入名义校验。
-        # 3) 满足最小名义（MIN_NOTIONAL）：名义=价格×数量
-        try:
-            if isinstance(self._min_notional, (int, float)) and (self._min_notional or 0) > 0:
-                step = float(self._step_size or 0.001)
-                if (price * qty) < float(self._min_notional):
-                    need_qty = float(self._min_notional) / price
-                    qty = ceil_to_step(need_qty, step)
-        except Exception:
-            pass
+        # 3) 满足最小名义（MIN_NOTIONAL）：名义=价格×数量，不足时按步进向上取整
+        min_notional = self._min_notional
+        if min_notional and (price * qty) < min_notional:
+            qty = math.ceil(min_notional / price / step) * step
         return notional, qty
 
+    def _parse_order_resp(self, res, tag: str) -> tuple[bool, float | None, float | None]:
+        """解析市价单响应，返回 (是否成交, 成交均价, 成交数量)，并输出一行结果日志。
+
+        成功条件：有成交数量或状态为 FILLED；均价/数量缺失时为 None，由调用方回退到本地估算值。
+        """
+        if not isinstance(res, dict):
+            self._plog(f"[ORDER-{tag}] failed: no response")
+            return False, None, None
+        if res.get("error"):
+            self._plog(f"[ORDER-{tag}] error: {res}")
+            return False, None, None
+        avg_price = res.get("avgPrice")
+        cum_qty = res.get("cumQty") or res.get("executedQty")
+        status = res.get("status")
+        ap = float(avg_price) if avg_price is not None else None
+        cq = float(cum_qty) if cum_qty is not None else None
+        ok = (cq is not None and cq > 0) or str(status).upper() == "FILLED"
+        self._plog(f"[ORDER-{tag}] resp status={status} avgPrice={avg_price} executedQty={cum_qty}")
+        return ok, ap, cq
+
     def _open_position(self, side: str, price: float) -> bool:
+        # 下单路径上多次访问的属性绑定为局部变量
+        client = self._client_auth
+        dual = self._dual_side
+        symbol = self.symbol
+        plog = self._plog
         notional, qty = self._notional_and_qty(price)
         exec_price = price
         exec_qty = qty
         # 实盘：发送市价单
-        if (not self.test_mode) and self._client_auth:
+        if (not self.test_mode) and client:
             try:
-                order_side = "BUY" if side == "LONG" else "SELL"
+                order_side = _OPEN_ORDER_SIDE[_SIDE_SIGN[side]]
                 # 双向持仓传 LONG/SHORT；单向持仓不传 positionSide
-                pos_side = ("LONG" if (self._dual_side and side == "LONG") else ("SHORT" if (self._dual_side and side == "SHORT") else None))
-                msg_try = f"[ORDER-OPEN] try {order_side} {self.symbol} qty={qty:.6f} pos_side={pos_side or '-'} dual={self._dual_side}"
-                print(msg_try)
-                try:
-                    self._log(msg_try)
-                except Exception:
-                    pass
-                res = self._client_auth.create_futures_market_order(
-                    self.symbol,
+                pos_side = side if dual else None
+                # 数量只格式化一次：日志与下单参数共用（等价于 round(qty, 6)）
+                qty_str = format(qty, ".6f")
+                msg_try = f"[ORDER-OPEN] try {order_side} {symbol} qty={qty_str} pos_side={pos_side or '-'} dual={dual}"
+                plog(msg_try)
+                res = client.create_futures_market_order(
+                    symbol,
                     order_side,
-                    quantity=round(qty, 6),
+                    quantity=float(qty_str),
                     reduce_only=False,
                     position_side=pos_side,
                     new_order_resp_type="RESULT",
                 )
-                order_success = False
-                if isinstance(res, dict):
-                    if res.get("error"):
-                        msg_err = f"[ORDER-OPEN] error: {res}"
-                        print(msg_err)
-                        try:
-                            self._log(msg_err)
-                        except Exception:
-                            pass
-                    else:
-                        avg_price = res.get("avgPrice")
-                        cum_qty = res.get("cumQty") or res.get("executedQty")
-                        status = res.get("status")
-                        if avg_price is not None:
-                            exec_price = float(avg_price)
-                        if cum_qty is not None:
-                            exec_qty = float(cum_qty)
-                        # 成功条件：有成交数量或状态为 FILLED
-                        if (cum_qty is not None and float(cum_qty) > 0) or str(status).upper() == "FILLED":
-                            order_success = True
-                        msg_resp = f"[ORDER-OPEN] resp status={status} avgPrice={avg_price} executedQty={cum_qty}"
-                        print(msg_resp)
-                        try:
-                            self._log(msg_resp)
-                        except Exception:
-                            pass
-                else:
-                    msg_no = "[ORDER-OPEN] failed: no response"
-                    print(msg_no)
-                    try:
-                        self._log(msg_no)
-                    except Exception:
-                        pass
+                order_success, avg_price, cum_qty = self._parse_order_resp(res, "OPEN")
+                if avg_price is not None:
+                    exec_price = avg_price
+                if cum_qty is not None:
+                    exec_qty = cum_qty
                 # 若实盘下单失败，则不更新本地持仓与余额
                 if not order_success:
                     msg_skip = "[OPEN] skipped local position update due to order failure"
-                    print(msg_skip)
-                    try:
-                        self._log(msg_skip)
-                    except Exception:
-                        pass
+                    plog(msg_skip)
                     return False
             except Exception as e:
                 try:
                     msg_exc = f"[ORDER-OPEN] exception during placing order: {e}"
-                    print(msg_exc)
-                    try:
-                        self._log(msg_exc)
-                    except Exception:
-                        pass
+                    plog(msg_exc)
                 except Exception:
                     msg_exc2 = "[ORDER-OPEN] exception during placing order"
-                    print(msg_exc2)
-                    try:
-                        self._log(msg_exc2)
-                    except Exception:
-                        pass
+                    plog(msg_exc2)
                 # 异常同样跳过本地更新
                 return False
-        fee = (exec_price * exec_qty * self.leverage) * self.fee_rate / self.leverage  # 近似开仓手续费
+        fee = exec_price * exec_qty * self.fee_rate  # 开仓手续费 = 成交名义 × 费率
         self.balance -= fee
-        self._insert_trade(side, exec_price, exec_qty, fee, pnl=-fee)
-        self._insert_wallet()
+        # 内存累计统计与余额同步更新，供 totals() 直接读取
+        self._agg_total_fee += fee
         self.position = Position(side=side, entry_price=exec_price, qty=exec_qty, open_fee=fee)
-        # 记录未平仓持仓，保证重启后可恢复
-        self._clear_position()
-        self._save_position()
-        print(f"[OPEN] {side} price={exec_price:.2f} qty={exec_qty:.6f} fee={fee:.4f} bal={self.balance:.2f}")
-        try:
-            self._log(f"[OPEN] {side} price={exec_price:.2f} qty={exec_qty:.6f} fee={fee:.4f} bal={self.balance:.2f}")
-        except Exception:
-            pass
+        # 成交与未平仓持仓（保证重启后可恢复）作为一个事务单元写入；余额快照由 _flush_wallet 周期写入
+        self._write(self._trade_insert_stmt(side, exec_price, exec_qty, fee, pnl=-fee), *self._position_stmts())
+        self._wallet_dirty = True
+        # 控制台与日志文件共用同一条消息，只格式化一次
+        plog(f"[OPEN] {side} price={exec_price:.2f} qty={exec_qty:.6f} fee={fee:.4f} bal={self.balance:.2f}")
         return True
 
     def _close_position(self, price: float) -> bool:
         if self.position.side is None or self.position.entry_price is None or self.position.qty is None:
             return False
         side = self.position.side
+        sign = self.position.sign
         entry = float(self.position.entry_price)
         qty = float(self.position.qty)
         open_fee = float(self.position.open_fee or 0.0)
+        # 下单路径上多次访问的属性绑定为局部变量
+        client = self._client_auth
+        dual = self._dual_side
+        symbol = self.symbol
+        plog = self._plog
 
         exec_price = price
         exec_qty = qty
         # 实盘：发送减仓市价单
-        if (not self.test_mode) and self._client_auth:
+        if (not self.test_mode) and client:
             try:
-                order_side = "SELL" if side == "LONG" else "BUY"
-                pos_side = ("LONG" if (self._dual_side and side == "LONG") else ("SHORT" if (self._dual_side and side == "SHORT") else None))
-                ro_flag = (False if self._dual_side else True)
-                msg_try = f"[ORDER-CLOSE] try {order_side} {self.symbol} qty={qty:.6f} pos_side={pos_side or '-'} dual={self._dual_side} reduceOnly={ro_flag}"
-                print(msg_try)
-                try:
-                    self._log(msg_try)
-                except Exception:
-                    pass
-                res = self._client_auth.create_futures_market_order(
-                    self.symbol,
+                order_side = _CLOSE_ORDER_SIDE[sign]
+                pos_side = side if dual else None
+                ro_flag = (False if dual else True)
+                qty_str = format(qty, ".6f")
+                msg_try = f"[ORDER-CLOSE] try {order_side} {symbol} qty={qty_str} pos_side={pos_side or '-'} dual={dual} reduceOnly={ro_flag}"
+                plog(msg_try)
+                res = client.create_futures_market_order(
+                    symbol,
                     order_side,
-                    quantity=round(qty, 6),
+                    quantity=float(qty_str),
                     reduce_only=ro_flag,
                     position_side=pos_side,
                     new_order_resp_type="RESULT",
                 )
-                order_success = False
-                if isinstance(res, dict):
-                    if res.get("error"):
-                        msg_err = f"[ORDER-CLOSE] error: {res}"
-                        print(msg_err)
-                        try:
-                            self._log(msg_err)
-                        except Exception:
-                            pass
-                    else:
-                        avg_price = res.get("avgPrice")
-                        cum_qty = res.get("cumQty") or res.get("executedQty")
-                        status = res.get("status")
-                        if avg_price is not None:
-                            exec_price = float(avg_price)
-                        if cum_qty is not None:
-                            exec_qty = float(cum_qty)
-                        if (cum_qty is not None and float(cum_qty) > 0) or str(status).upper() == "FILLED":
-                            order_success = True
-                        msg_resp = f"[ORDER-CLOSE] resp status={status} avgPrice={avg_price} executedQty={cum_qty}"
-                        print(msg_resp)
-                        try:
-                            self._log(msg_resp)
-                        except Exception:
-                            pass
-                else:
-                    msg_no = "[ORDER-CLOSE] failed: no response"
-                    print(msg_no)
-                    try:
-                        self._log(msg_no)
-                    except Exception:
-                        pass
+                order_success, avg_price, cum_qty = self._parse_order_resp(res, "CLOSE")
+                if avg_price is not None:
+                    exec_price = avg_price
+                if cum_qty is not None:
+                    exec_qty = cum_qty
                 if not order_success:
                     msg_skip = "[CLOSE] skipped local position update due to order failure"
-                    print(msg_skip)
-                    try:
-                        self._log(msg_skip)
-                    except Exception:
-                        pass
+                    plog(msg_skip)
                     return False
             except Exception as e:
                 try:
                     msg_exc = f"[ORDER-CLOSE] exception during placing order: {e}"
-                    print(msg_exc)
-                    try:
-                        self._log(msg_exc)
-                    except Exception:
-                        pass
+                    plog(msg_exc)
                 except Exception:
                     msg_exc2 = "[ORDER-CLOSE] exception during placing order"
-                    print(msg_exc2)
-                    try:
-                        self._log(msg_exc2)
-                    except Exception:
-                        pass
+                    plog(msg_exc2)
                 return False
 
-        pnl = 0.0
-        if side == "LONG":
-            pnl = (exec_price - entry) * exec_qty
-        elif side == "SHORT":
-            pnl = (entry - exec_price) * exec_qty
+        # 方向由 sign 体现，无需按 side 分支
+        pnl = (exec_price - entry) * exec_qty * sign
 
         notional = exec_price * exec_qty
         fee = notional * self.fee_rate
@@ -1080,16 +1278,15 @@ class TradingEngine:
         self.balance -= fee
         # 记录净盈亏：价格差 - 平仓手续费 - 开仓手续费
         net_pnl = pnl - fee - open_fee
-        self._insert_trade("CLOSE", exec_price, exec_qty, fee, net_pnl)
-        self._insert_wallet()
-        print(f"[CLOSE] {side} @ {exec_price:.2f} gross_pnl={pnl:.4f} fee_close={fee:.4f} fee_open={open_fee:.4f} net_pnl={net_pnl:.4f} bal={self.balance:.2f}")
-        try:
-            self._log(f"[CLOSE] {side} @ {exec_price:.2f} gross_pnl={pnl:.4f} fee_close={fee:.4f} fee_open={open_fee:.4f} net_pnl={net_pnl:.4f} bal={self.balance:.2f}")
-        except Exception:
-            pass
-        self.position = Position(side=None, entry_price=None, qty=None, open_fee=None)
-        # 清除未平仓持仓记录
-        self._clear_position()
+        # 内存累计统计与余额同步更新，供 totals() 直接读取
+        self._agg_total_fee += fee
+        self._agg_total_pnl += net_pnl
+        self._agg_trade_count += 1
+        self.position = _FLAT
+        # 成交与清除持仓作为一个事务单元写入；余额快照由 _flush_wallet 周期写入
+        self._write(self._trade_insert_stmt("CLOSE", exec_price, exec_qty, fee, net_pnl), (_SQL_CLEAR_POSITION, ()))
+        self._wallet_dirty = True
+        plog(f"[CLOSE] {side} @ {exec_price:.2f} gross_pnl={pnl:.4f} fee_close={fee:.4f} fee_open={open_fee:.4f} net_pnl={net_pnl:.4f} bal={self.balance:.2f}")
         return True
 
     def _open_with_confirm(self, side: str, price: float, *, max_retries: int = 5, delay_sec: float = 0.8) -> bool:
@@ -1098,7 +1295,7 @@ class TradingEngine:
             ok = self._open_position(side, price)
             if not ok:
                 try:
-                    self._log(f"[OPEN-CHECK] attempt {attempt} failed, retrying...")
+                    self._log("[OPEN-CHECK] attempt %s failed, retrying...", attempt)
                 except Exception:
                     pass
                 time.sleep(delay_sec)
@@ -1108,18 +1305,14 @@ class TradingEngine:
                 try:
                     prefer = (side if self._dual_side else None)
                     def check_fn() -> bool:
-                        rp = self._client_auth.get_futures_position(self.symbol, prefer_side=prefer)
+                        rp = self._client_auth.get_futures_position(self.symbol, prefer_side=prefer, fresh=True)
                         return bool(rp and rp.get("positionAmt") is not None and abs(float(rp.get("positionAmt"))) > 0)
                     ok_confirm = self._wait_until(check_fn, timeout_sec=self.confirm_timeout_sec, poll_interval_sec=self.confirm_poll_interval_sec)
                     if ok_confirm:
                         return True
                     else:
                         msg = f"[OPEN-CHECK] no position detected within {self.confirm_timeout_sec:.1f}s, attempt {attempt}"
-                        print(msg)
-                        try:
-                            self._log(msg)
-                        except Exception:
-                            pass
+                        self._plog(msg)
                 except Exception:
                     pass
             else:
@@ -1133,7 +1326,7 @@ class TradingEngine:
             ok = self._close_position(price)
             if not ok:
                 try:
-                    self._log(f"[CLOSE-CHECK] attempt {attempt} failed, retrying...")
+                    self._log("[CLOSE-CHECK] attempt %s failed, retrying...", attempt)
                 except Exception:
                     pass
                 time.sleep(delay_sec)
@@ -1143,7 +1336,7 @@ class TradingEngine:
                 try:
                     prefer = (prev_side if self._dual_side else None)
                     def check_fn() -> bool:
-                        rp = self._client_auth.get_futures_position(self.symbol, prefer_side=prefer)
+                        rp = self._client_auth.get_futures_position(self.symbol, prefer_side=prefer, fresh=True)
                         has_pos = bool(rp and rp.get("positionAmt") is not None and abs(float(rp.get("positionAmt"))) > 0)
                         # 若仍有仓位则在轮询过程中同步一次本地剩余仓位，便于下一轮重试继续减仓
                         if has_pos:
@@ -1159,11 +1352,7 @@ class TradingEngine:
                         return True
                     else:
                         msg = f"[CLOSE-CHECK] position remains within {self.confirm_timeout_sec:.1f}s, attempt {attempt}"
-                        print(msg)
-                        try:
-                            self._log(msg)
-                        except Exception:
-                            pass
+                        self._plog(msg)
                 except Exception:
                     pass
             else:
@@ -1188,9 +1377,18 @@ class TradingEngine:
                 return False
             time.sleep(interval)
 
-    def _log(self, msg: str):
+    def _plog(self, msg: str):
+        """同时输出到控制台与 trading.log（写日志的异常由 _log 吞掉）。
+
+        控制台经队列化的 `logger` 写出（格式与 print 相同），交易路径不持有 stdout 锁、不等待终端 I/O。
+        """
+        logger.info(msg)
+        self._log(msg)
+
+    def _log(self, msg: str, *args):
+        """写入 trading.log；带参数时按 %-格式延迟格式化（日志级别未开启时不产生字符串）。"""
         try:
-            self._logger.info(msg)
+            self._logger.info(msg, *args)
         except Exception:
             pass
 
@@ -1204,71 +1402,46 @@ class TradingEngine:
         except Exception:
             real_pos = None
 
-        # 组装持仓信息
-        side = self.position.side
-        entry_price = self.position.entry_price
-        qty_coin = self.position.qty
+        # 组装持仓信息（持仓快照一次性读取；get_futures_position 已归一为 dict|None，数值字段为 float|None）
+        pos = self.position
+        side = pos.side
+        entry_price = pos.entry_price
+        qty_coin = pos.qty
+        cp = self.current_price  # tick 回调中已转为 float；整个 status 只读取一次，保证各字段基于同一价格
         pos_margin = None
         unrealized_net: float | None = None
-        if isinstance(real_pos, dict) and real_pos.get("positionAmt") is not None:
-            amt = float(real_pos.get("positionAmt"))
+        amt = real_pos.get("positionAmt") if real_pos is not None else None
+        if amt is not None:
             qty_coin = abs(amt)
-            entry_price = float(real_pos.get("entryPrice") or (entry_price or 0.0)) or None
+            entry_price = real_pos.get("entryPrice") or entry_price or None
             # 推断方向（单向模式下 BOTH 用数量正负判断）
-            if amt > 0:
-                side = "LONG"
-            elif amt < 0:
-                side = "SHORT"
-            else:
-                side = None
-            m = real_pos.get("margin")
-            if isinstance(m, (int, float)):
-                pos_margin = float(m)
+            side = "LONG" if amt > 0 else ("SHORT" if amt < 0 else None)
+            pos_margin = real_pos.get("margin")
             # 计算净未实现盈亏（原始未实现盈亏 - 预估平仓手续费）
-            try:
-                unp = real_pos.get("unrealizedProfit")
-                if (unp is not None) and self.current_price and qty_coin:
-                    unp_val = float(unp)
-                    notional = float(self.current_price) * float(qty_coin)
-                    close_fee_est = notional * float(self.fee_rate)
-                    unrealized_net = float(unp_val) - float(close_fee_est)
-            except Exception:
-                pass
-        else:
+            unp = real_pos.get("unrealizedProfit")
+            if (unp is not None) and cp and qty_coin:
+                unrealized_net = unp - cp * qty_coin * self.fee_rate
+        elif side and entry_price and qty_coin and cp:
             # 模拟或无 API 情况：用本地持仓与当前价格估算净未实现盈亏
-            try:
-                if side and entry_price and qty_coin and self.current_price:
-                    ep = float(entry_price)
-                    cp = float(self.current_price)
-                    q = float(qty_coin)
-                    open_pnl = (cp - ep) * q if side == "LONG" else (ep - cp) * q
-                    notional = cp * q
-                    close_fee_est = notional * float(self.fee_rate)
-                    unrealized_net = float(open_pnl) - float(close_fee_est)
-            except Exception:
-                pass
+            open_pnl = (cp - entry_price) * qty_coin * pos.sign
+            unrealized_net = open_pnl - cp * qty_coin * self.fee_rate
         # 当前持仓名义（用于“数量: USDT”显示）
         # 名义价值（数量(币)×价格），以及“实时价值=名义价值+净未实现盈亏”
-        pos_val_nominal = 0.0
-        if qty_coin and self.current_price:
-            pos_val_nominal = float(qty_coin) * float(self.current_price)
-        pos_val_display = pos_val_nominal + (float(unrealized_net) if isinstance(unrealized_net, (int, float)) else 0.0)
+        pos_val_nominal = qty_coin * cp if (qty_coin and cp) else 0.0
+        pos_val_display = pos_val_nominal + (unrealized_net or 0.0)
 
         latest_kline = self.latest_kline
+        # 指标尾值在锁内读取：deque 在 tick 线程替换末值时（pop 后 append）可能短暂为空或缺一位
+        with self._series_lock:
+            ema_last = self.ema_list[-1] if self.ema_list else None
+            ma_last = self.ma_list[-1] if self.ma_list else None
         out = {
-            "symbol": self.symbol,
-            "interval": self.interval,
-            "balance": round(self.balance, 4),
+            **self._status_const,
+            "balance": self.balance,
             "initial_balance": self.initial_balance,
-            "leverage": self.leverage,
-            "fee_rate": self.fee_rate,
-            "percent": self.percent,
-            "current_price": self.current_price,
-            "ema": self.ema_list[-1] if self.ema_list else None,
-            "ma": self.ma_list[-1] if self.ma_list else None,
-            # 动态提供均线周期，供前端展示（避免硬编码 5/15）
-            "ema_period": self.ema_period,
-            "ma_period": self.ma_period,
+            "current_price": cp,
+            "ema": ema_last,
+            "ma": ma_last,
             "position": {
                 "side": side,
                 "entry_price": entry_price,
@@ -1276,7 +1449,7 @@ class TradingEngine:
                 # 显示值：数量(USDT)+净未实现盈亏
                 "value": pos_val_display,
                 # 供前端显示 Binance UI 的“数量(USDT)”与“保证金(USDT)”
-                "api_qty_usdt": pos_val_nominal if (qty_coin and self.current_price) else None,
+                "api_qty_usdt": pos_val_nominal if (qty_coin and cp) else None,
                 "margin_usdt": pos_margin,
                 # 供前端直接展示“未实现盈亏”
                 "unrealized_pnl": unrealized_net,
@@ -1285,14 +1458,14 @@ class TradingEngine:
         }
         return out
 
-    def recent_trades(self, limit: int = 5) -> list[dict]:
+    def _recent_rows(self, sql: str, cols: tuple[str, ...], limit: int) -> list[dict]:
+        # 按固定列名把元组行直接 zip 成字典
         cur = self._db.cursor()
-        cur.execute("SELECT * FROM trades ORDER BY id DESC LIMIT ?", (limit,))
-        rows = cur.fetchall()
-        return [dict(r) for r in rows]
+        cur.execute(sql, (limit,))
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def recent_trades(self, limit: int = 5) -> list[dict]:
+        return self._recent_rows(_SQL_RECENT_TRADES, _TRADE_COLS, limit)
 
     def recent_klines(self, limit: int = 5) -> list[dict]:
-        cur = self._db.cursor()
-        cur.execute("SELECT * FROM klines ORDER BY id DESC LIMIT ?", (limit,))
-        rows = cur.fetchall()
-        return [dict(r) for r in rows]
\ No newline at end of file
+        return self._recent_rows(_SQL_RECENT_KLINES, _KLINE_COLS, limit)
\ No newline at end of file
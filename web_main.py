@@ -13,7 +13,7 @@ import time
 from pathlib import Path
 import os
 import re
-from typing import Any
+from typing import Any, Callable
 
 from flask import Flask, jsonify, Response, request
 import psutil
@@ -134,6 +134,54 @@ def get_config_summary(engine: TradingEngine, tz_offset_hours: int, enable_polle
     except Exception:
         return {}
 
+def round_for_display(s: dict) -> dict:
+    """序列化前统一处理展示精度（引擎内部保持原始浮点值），原地修改并返回。"""
+    try:
+        if isinstance(s.get("balance"), float):
+            s["balance"] = round(s["balance"], 4)
+        totals = s.get("totals")
+        if isinstance(totals, dict):
+            for key in ("total_pnl", "total_fee"):
+                if isinstance(totals.get(key), float):
+                    totals[key] = round(totals[key], 6)
+    except Exception:
+        pass
+    return s
+
+
+# 事件队列中的“状态刷新”标记：由 SSE 推送线程调用 build_status_event 组装完整状态
+STATUS_REFRESH = object()
+
+
+def build_status_event(engine: TradingEngine, tz_offset_hours: int, enable_poller: bool) -> dict:
+    """组装推送给前端的完整状态（持仓/最近成交/系统信息/累计统计/配置汇总）。"""
+    s = engine.status()
+    s["recent_trades"] = engine.recent_trades(50)
+    s["recent_klines"] = engine.recent_klines(5)
+    s["server_time"] = int(time.time() * 1000)
+    # 附带系统信息（CPU/MEM/DISK）
+    s["sysinfo"] = get_sysinfo()
+    # 汇总总盈亏/总手续费/总收益率
+    s["totals"] = engine.totals()
+    # 附带配置汇总（含交易时长），保证卡片随事件更新
+    s["config"] = get_config_summary(engine, tz_offset_hours, enable_poller)
+    return s
+
+
+def status_notifier(events_q: queue.Queue | None) -> Callable[[], None]:
+    """行情处理线程的 on_processed 回调：只投递刷新标记，状态由 SSE 推送线程组装，
+    避免 status()（实盘含 REST 查询）拖慢下一条 K 线的处理。"""
+
+    def push_status():
+        if events_q is not None:
+            try:
+                events_q.put_nowait(STATUS_REFRESH)
+            except Exception:
+                pass
+
+    return push_status
+
+
 def start_ws(
     engine: TradingEngine,
     symbol: str,
@@ -147,24 +195,11 @@ def start_ws(
 ):
     """启动 Binance WS（仅使用 WS，不再启用价格轮询回退）。"""
 
+    # 指标/信号/下单在引擎的行情处理线程中执行，WS 回调只负责投递；每批处理完后通知前端刷新
+    engine.start_tick_worker(on_processed=status_notifier(events_q))
+
     def on_kline(k: dict):
-        engine.on_realtime_kline(k)
-        # 推送最新状态到前端（与 Binance WS 同步节奏）
-        if events_q is not None:
-            try:
-                s = engine.status()
-                s["recent_trades"] = engine.recent_trades(50)
-                s["recent_klines"] = engine.recent_klines(5)
-                s["server_time"] = int(time.time() * 1000)
-                # 附带系统信息（CPU/MEM/DISK）
-                s["sysinfo"] = get_sysinfo()
-                # 汇总总盈亏/总手续费/总收益率
-                s["totals"] = engine.totals()
-                # 附带配置汇总（含交易时长），保证卡片随事件更新
-                s["config"] = get_config_summary(engine, tz_offset_hours, enable_poller)
-                events_q.put_nowait(s)
-            except Exception:
-                pass
+        engine.submit_kline(k)
 
     def on_open():
         # WS 连接成功（不再使用价格轮询回退）
@@ -196,6 +231,8 @@ def start_price_poller(engine: TradingEngine, client: BinanceClient, events_q: q
     每 2 秒获取一次价格，并更新引擎的当前价与未收盘K线价格。
     """
     stop_flag = threading.Event()
+    # 轮询价格同样交给行情处理线程；处理完后推送状态，保证 WS 不稳定时仍能更新前端
+    engine.start_tick_worker(on_processed=status_notifier(events_q))
 
     def run():
         while not stop_flag.is_set():
@@ -215,22 +252,7 @@ def start_price_poller(engine: TradingEngine, client: BinanceClient, events_q: q
                     "close": price,
                     "volume": 0.0,
                 }
-                engine.on_realtime_kline(k)
-                # 推送状态，保证 WS 不稳定时仍能更新前端
-                if events_q is not None:
-                    try:
-                        s = engine.status()
-                        s["recent_trades"] = engine.recent_trades(50)
-                        s["recent_klines"] = engine.recent_klines(5)
-                        s["server_time"] = int(time.time() * 1000)
-                        s["sysinfo"] = get_sysinfo()
-                        # 修复：轮询事件也附带 totals，避免页面在“-”与数值之间来回切换
-                        s["totals"] = engine.totals()
-                        # 附带配置汇总（含交易时长）
-                        s["config"] = get_config_summary(engine, tz_offset_hours, enable_poller)
-                        events_q.put_nowait(s)
-                    except Exception:
-                        pass
+                engine.submit_kline(k)
             except Exception:
                 pass
             time.sleep(2)
@@ -342,29 +364,28 @@ def create_app(engine: TradingEngine, port: int, tz_offset: int, events_q: queue
                 pass
 
         # 对齐 EMA/MA 到时间轴：根据引擎 timestamps 建立索引，缺失处填 None。
-        ema_full = getattr(engine, 'ema_list', []) or []
-        ma_full = getattr(engine, 'ma_list', []) or []
-        ts_full = getattr(engine, 'timestamps', []) or []
-        idx_by_ts = {}
+        # 引擎序列由行情线程持续推进，这里只读取加锁拍下的快照，再一次 zip 遍历建立 时间 -> (EMA, MA) 映射
+        ts_full, closes_snap, ema_full, ma_full = engine.series_snapshot()
+        ind_by_ts = {}
         try:
-            idx_by_ts = {int(ts_full[i]): i for i in range(len(ts_full))}
+            ind_by_ts = {int(t): (e, m) for t, e, m in zip(ts_full, ema_full, ma_full)}
         except Exception:
-            idx_by_ts = {}
+            ind_by_ts = {}
 
         ema_list: list = []
         ma_list: list = []
         for t in ts:
-            i = idx_by_ts.get(int(t))
-            if i is None or i < 0 or i >= len(ema_full) or i >= len(ma_full):
+            pair = ind_by_ts.get(int(t))
+            if pair is None:
                 ema_list.append(None)
                 ma_list.append(None)
             else:
                 try:
-                    ema_list.append(float(ema_full[i]))
+                    ema_list.append(float(pair[0]))
                 except Exception:
                     ema_list.append(None)
                 try:
-                    ma_list.append(float(ma_full[i]))
+                    ma_list.append(float(pair[1]))
                 except Exception:
                     ma_list.append(None)
 
@@ -376,7 +397,8 @@ def create_app(engine: TradingEngine, port: int, tz_offset: int, events_q: queue
                 # 仅当末尾仍为 None（表示映射阶段没有现成指标）时计算临时值
                 if ema_list and ema_list[-1] is None:
                     latest_close = float(latest.get('close'))
-                    closes_full = (getattr(engine, 'closes', []) or []) + [latest_close]
+                    closes_full = list(closes_snap)
+                    closes_full.append(latest_close)
                     # 重新计算一次末尾指标（开销可接受，确保与指标模块一致）
                     ema_full2 = calc_ema(closes_full, engine.ema_period)
                     sma_full2 = calc_sma(closes_full, engine.ma_period)
@@ -411,7 +433,7 @@ def create_app(engine: TradingEngine, port: int, tz_offset: int, events_q: queue
         s["config"] = get_config_summary(engine, tz_offset, enable_poller)
         # 修复：首次加载也返回 totals，避免首屏显示“-”随后切换为数值造成闪烁
         s["totals"] = engine.totals()
-        return jsonify(s)
+        return jsonify(round_for_display(s))
 
     @app.route("/")
     def index():
@@ -1124,10 +1146,23 @@ def create_app(engine: TradingEngine, port: int, tz_offset: int, events_q: queue
     @app.route('/events/status')
     def events_status():
         def stream():
+            pending = None
             while True:
                 try:
-                    s = events_q.get()
-                    yield f"data: {json.dumps(s)}\n\n"
+                    s = pending if pending is not None else events_q.get()
+                    pending = None
+                    if s is STATUS_REFRESH:
+                        # 合并积压的连续刷新标记，只组装一次最新状态；遇到其他事件留到下一轮推送
+                        while True:
+                            try:
+                                nxt = events_q.get_nowait()
+                            except queue.Empty:
+                                break
+                            if nxt is not STATUS_REFRESH:
+                                pending = nxt
+                                break
+                        s = build_status_event(engine, tz_offset, enable_poller)
+                    yield f"data: {json.dumps(round_for_display(s))}\n\n"
                 except Exception:
                     time.sleep(0.1)
         return Response(stream(), mimetype='text/event-stream')